@@ -1,10 +1,13 @@
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
+from backend.cache import ResultCache
+from backend.jobs import JobQueue
 from backend.routes import register_routes
 
 # compute project_root/
@@ -14,7 +17,20 @@ BASE = Path(__file__).parent.parent.absolute()
 UPLOAD_DIR = Path(os.environ.get("UPLOAD_FOLDER", "/tmp/uploads"))
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
-app = FastAPI(title="Modal Analysis API", version="1.0.0")
+# analyses run in a bounded process pool, further uploads get 429 once MAX_QUEUE jobs are waiting
+ANALYSIS_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", 2))
+MAX_QUEUE = int(os.environ.get("MAX_QUEUE", 8))
+
+# parsed models and results of uploads, keyed by their contents
+CACHE_DIR = Path(os.environ.get("CACHE_FOLDER", "/tmp/modal_cache"))
+CACHE_MAX_MB = float(os.environ.get("CACHE_MAX_MB", 10240))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    app.state.job_queue.shutdown()
+
+app = FastAPI(title="Modal Analysis API", version="1.0.0", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -27,6 +43,8 @@ app.add_middleware(
 
 # Store upload directory in app state for access in routes
 app.state.upload_folder = UPLOAD_DIR
+app.state.job_queue = JobQueue(max_workers=ANALYSIS_WORKERS, max_queue=MAX_QUEUE)
+app.state.result_cache = ResultCache(CACHE_DIR, max_mb=CACHE_MAX_MB)
 
 # register routes
 register_routes(app)
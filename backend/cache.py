@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+
+
+class ResultCache:
+    """
+    ResultCache is a content-addressed cache of uploaded models and their analysis results on local disk.
+    Parsed models are stored by core.parser.modelCache.ModelCache under models/, keyed by the content hash
+    of the dat/inp pair, so re-analysing the same files with other thresholds skips parsing. The per-mode
+    metrics of each model are stored under metrics/, so a model can be re-classified without its files. Results
+    are stored under results/ as JSON, keyed by the model key and the thresholds, so identical requests skip the analysis.
+    Entries are evicted least recently used first once the cache holds more than max_mb.
+    Attributes:
+        cache_dir (Path): Directory holding the cache.
+        model_dir (Path): Directory of the parsed models, to be passed to ModalParser as cache_dir.
+        metrics_dir (Path): Directory of the per-mode metrics of the models.
+        max_bytes (int): Disk budget of the cache.
+        stats (dict): Hit/miss and eviction counters.
+    Methods:
+        result_key(model_key, params): Returns the key of the result of a model analysed with params.
+        count_model(hit): Counts a model loaded from the cache (hit) or parsed from its files.
+        get_result(key): Returns a cached result, or None.
+        put_result(key, result): Stores a result and evicts entries beyond the budget.
+        get_metrics(model_key): Returns the cached (mode_metrics, mode_table_df) of a model, or None.
+        put_metrics(model_key, mode_metrics, mode_table_df): Stores the per-mode metrics of a model.
+        evict(): Removes least recently used entries until the cache fits in max_bytes.
+        info(): Returns the counters and disk usage of the cache.
+    """
+    def __init__(self, cache_dir: str | Path, max_mb: float = 10240):
+        if max_mb < 0:
+            raise ValueError(f"max_mb must be non-negative. Provided: {max_mb}")
+        self.cache_dir = Path(cache_dir)
+        self.model_dir = self.cache_dir / "models"
+        self.metrics_dir = self.cache_dir / "metrics"
+        self.result_dir = self.cache_dir / "results"
+        self.model_dir.mkdir(parents=True, exist_ok=True)
+        self.metrics_dir.mkdir(parents=True, exist_ok=True)
+        self.result_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.stats = {"result_hits": 0, "result_misses": 0, "model_hits": 0, "model_misses": 0, "evictions": 0}
+        # Results are stored from executor callback threads
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def result_key(model_key: str, params: Dict[str, Any]) -> str:
+        return hashlib.sha256(f"{model_key}:{json.dumps(params, sort_keys=True)}".encode()).hexdigest()
+
+    def count_model(self, hit: bool) -> None:
+        # Counted once the analysis reports whether it could load the model, which is only known after it ran
+        with self._lock:
+            self.stats["model_hits" if hit else "model_misses"] += 1
+
+    def get_result(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self.result_dir / f"{key}.json"
+        try:
+            with open(path, "r") as f:
+                result = json.load(f)
+            os.utime(path) # mark as recently used
+        except (OSError, ValueError):
+            self.stats["result_misses"] += 1
+            return None
+        self.stats["result_hits"] += 1
+        return result
+
+    @staticmethod
+    def _write_json(path: Path, data: Dict[str, Any]) -> None:
+        # Write next to the target first, so readers never see a partial file
+        tmp_path = path.parent / f".{path.name}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def put_result(self, key: str, result: Dict[str, Any]) -> None:
+        self._write_json(self.result_dir / f"{key}.json", result)
+        self.evict()
+
+    def get_metrics(self, model_key: str) -> Optional[Tuple[pd.DataFrame, pd.DataFrame]]:
+        """
+        Returns the (mode_metrics, mode_table_df) stored for a model, or None if they are not cached.
+        """
+        path = self.metrics_dir / f"{model_key}.json"
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            mode_metrics = pd.DataFrame(data["mode_metrics"]).set_index("mode_no")
+            mode_table_df = pd.DataFrame(data["mode_table"])[["mode_no", "freq"]]
+            os.utime(path) # mark as recently used
+        except (OSError, ValueError, KeyError, TypeError):
+            # Missing, or not a metrics entry
+            return None
+        return mode_metrics, mode_table_df
+
+    def put_metrics(self, model_key: str, mode_metrics: pd.DataFrame, mode_table_df: pd.DataFrame) -> None:
+        """
+        Stores the per-mode metrics (ModalAnalyser.get_mode_metrics) and ['mode_no', 'freq'] table of a model,
+        so it can be re-classified with other thresholds without its files.
+        """
+        self._write_json(self.metrics_dir / f"{model_key}.json", {
+            "mode_metrics": mode_metrics.reset_index().to_dict(orient="list"),
+            "mode_table": mode_table_df[["mode_no", "freq"]].to_dict(orient="list"),
+        })
+
+    @staticmethod
+    def _size(path: Path) -> int:
+        if path.is_dir():
+            return sum(f.stat().st_size for f in path.iterdir() if f.is_file())
+        return path.stat().st_size
+
+    def _entries(self) -> list:
+        entries = []
+        for path in [*self.model_dir.iterdir(), *self.metrics_dir.iterdir(), *self.result_dir.iterdir()]:
+            if path.name.startswith("."):
+                continue # still being written
+            try:
+                entries.append((path.stat().st_mtime, self._size(path), path))
+            except OSError:
+                continue # evicted concurrently
+        return entries
+
+    def evict(self) -> None:
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry[0])
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                if path.is_dir():
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    path.unlink(missing_ok=True)
+                total -= size
+                self.stats["evictions"] += 1
+
+    def info(self) -> Dict[str, Any]:
+        entries = self._entries()
+        return {
+            **self.stats,
+            "models": sum(path.parent == self.model_dir for _, _, path in entries),
+            "metrics": sum(path.parent == self.metrics_dir for _, _, path in entries),
+            "results": sum(path.parent == self.result_dir for _, _, path in entries),
+            "size_mb": sum(size for _, size, _ in entries) / (1024 * 1024),
+            "max_size_mb": self.max_bytes / (1024 * 1024),
+        }
@@ -0,0 +1,164 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+
+class QueueFullError(Exception):
+    """
+    Raised when a job is submitted while the queue already holds max_queue pending jobs.
+    """
+
+
+class JobQueue:
+    """
+    JobQueue runs analyses in a bounded process pool, so the API event loop is never blocked by one.
+    Jobs are identified by a job id and keep their status and result until they are evicted, oldest
+    finished job first, once more than max_finished jobs are done.
+    If a worker process dies (e.g. killed for running out of memory), the pool is broken: its jobs fail and
+    the pool is replaced by a new one, so later jobs still run.
+    Attributes:
+        max_workers (int): Number of worker processes.
+        max_queue (int): Number of jobs allowed to wait for a free worker. Further submissions raise QueueFullError.
+        max_finished (int): Number of finished jobs whose results are kept.
+    Methods:
+        new_job_id(): Returns a new unique job id.
+        pending(): Returns the number of jobs not finished yet.
+        is_full(): Returns True if a new job would be rejected.
+        submit(job_id, fn, *args, on_result=None, on_done=None): Runs fn(*args) in a worker process under job_id.
+        add_done(job_id, result): Records an already finished job.
+        get(job_id): Returns the status of a job, with its result or error once finished.
+        shutdown(): Stops the worker processes.
+    """
+    def __init__(self, max_workers: int = 2, max_queue: int = 8, max_finished: int = 1000):
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1. Provided: {max_workers}")
+        if max_queue < 0:
+            raise ValueError(f"max_queue must be non-negative. Provided: {max_queue}")
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_finished = max_finished
+        self._executor = ProcessPoolExecutor(max_workers=max_workers)
+        # The executor is replaced from executor callback threads when a worker dies
+        self._executor_lock = threading.Lock()
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict() # job_id -> {"future", "submitted_at", "finished_at"}
+
+    @staticmethod
+    def new_job_id() -> str:
+        return uuid.uuid4().hex
+
+    def pending(self) -> int:
+        return sum(not job["future"].done() for job in self._jobs.values())
+
+    def is_full(self) -> bool:
+        # Running jobs occupy the workers, the rest wait in the queue
+        return self.pending() >= self.max_workers + self.max_queue
+
+    def _replace_executor(self, broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        """
+        Replaces the executor by a new one if it is still the broken one, and returns the current executor.
+        """
+        with self._executor_lock:
+            if self._executor is broken:
+                # A broken pool terminates its own processes. It must not be shut down from here: this runs
+                # in its callback thread, which holds the pool's shutdown lock
+                print("Warning: a worker process died, restarting the worker pool")
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def submit(
+        self,
+        job_id: str,
+        fn: Callable,
+        *args,
+        on_result: Optional[Callable[[Any], None]] = None,
+        on_done: Optional[Callable[[], None]] = None,
+    ) -> str:
+        """
+        Runs fn(*args) in a worker process under job_id. on_result, if given, is called with the result
+        of a successful job, and on_done once the job is finished, whether it succeeded or failed (e.g. to
+        remove its files), both in a thread of this process.
+        """
+        if self.is_full():
+            raise QueueFullError(f"{self.pending()} jobs are pending. Please retry later.")
+        executor = self._executor
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            # A worker died since the last job finished: retry once in a new pool
+            executor = self._replace_executor(executor)
+            future = executor.submit(fn, *args)
+        job = {"future": future, "submitted_at": time.time(), "finished_at": None}
+
+        def finish(future: Future) -> None:
+            job["finished_at"] = time.time()
+            error = None if future.cancelled() else future.exception()
+            if isinstance(error, BrokenProcessPool):
+                # Every job of the pool fails with this error; later jobs go to a new pool
+                self._replace_executor(executor)
+            if on_result is not None and not future.cancelled() and error is None:
+                try:
+                    on_result(future.result())
+                except Exception as e:
+                    print(f"Warning: result callback of job {job_id} failed: {e}")
+            if on_done is not None:
+                try:
+                    on_done()
+                except Exception as e:
+                    print(f"Warning: done callback of job {job_id} failed: {e}")
+
+        future.add_done_callback(finish)
+        self._jobs[job_id] = job
+        self._evict_finished()
+        return job_id
+
+    def add_done(self, job_id: str, result: Any) -> str:
+        """
+        Records a job whose result is already known (e.g. cached), so it is served like any other job.
+        """
+        future = Future()
+        future.set_result(result)
+        now = time.time()
+        self._jobs[job_id] = {"future": future, "submitted_at": now, "finished_at": now}
+        self._evict_finished()
+        return job_id
+
+    def _evict_finished(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job["future"].done()]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the status of a job, or None if the job id is unknown.
+
+        Returns:
+        dict: {"job_id", "status", "submitted_at", "finished_at"} plus "result" once done or "error" once failed.
+            status is one of "queued", "running", "done" or "failed".
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+
+        future: Future = job["future"]
+        status = {"job_id": job_id, "submitted_at": job["submitted_at"], "finished_at": job["finished_at"]}
+        if not future.done():
+            status["status"] = "running" if future.running() else "queued"
+        elif future.cancelled():
+            # Cancelled when the workers were shut down before the job ran; exception() would raise here
+            status["status"] = "failed"
+            status["error"] = "The job was cancelled before it ran. Please submit it again."
+        elif future.exception() is not None:
+            status["status"] = "failed"
+            status["error"] = str(future.exception())
+        else:
+            status["status"] = "done"
+            status["result"] = future.result()
+        return status
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,18 +1,181 @@
+import hashlib
 import os
+import shutil
 from pathlib import Path
-from typing import Dict, Any
+from typing import BinaryIO, Dict, Any, List, Optional, Tuple
 
-from fastapi import FastAPI, File, UploadFile, HTTPException
+import pandas as pd
+
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+from pydantic import BaseModel, Field
 
+from backend.cache import ResultCache
+from backend.jobs import QueueFullError
+from core.analyser.modalAnalyser import ModalAnalyser, RIGID_RATIO_THRES, TANG_RATIO_THRES
+from core.parser.datIndexer import DATIndexer
+from core.parser.modelCache import model_key
 from scripts.main import main
 
+# uploads are written to disk in chunks of this size, so memory per request does not grow with the file
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def save_upload(upload: BinaryIO, path: Path, index_dat: bool = False) -> Tuple[str, Optional[Dict[int, Tuple[int, int]]]]:
+    """
+    Copies an upload (the file of an UploadFile) to path in UPLOAD_CHUNK_SIZE chunks, hashing it on the way.
+    It blocks for the whole copy, so the API runs it in a worker thread (run_in_threadpool), never on the event loop.
+    With index_dat, the eigenvector tables of the .dat file are also indexed during the copy.
+    Starlette has already received the whole request body into a temporary file by the time this runs, so
+    this is one more pass over the file after the upload is complete: it saves the analysis a separate
+    hashing and indexing scan, but the analysis does not start before the upload has finished.
+
+    Returns:
+    tuple: (digest, mode_index)
+        digest: SHA-256 hex digest of the upload, as core.parser.modelCache.file_digest would return
+        mode_index: index of the .dat file, or None if not requested or the file could not be indexed
+            (the analysis then reports what is wrong with the file)
+    """
+    digest = hashlib.sha256()
+    indexer = DATIndexer() if index_dat else None
+    with open(path, "wb") as f:
+        while chunk := upload.read(UPLOAD_CHUNK_SIZE):
+            f.write(chunk)
+            digest.update(chunk)
+            if indexer is not None:
+                try:
+                    indexer.feed(chunk)
+                except Exception:
+                    indexer = None
+
+    mode_index = None
+    if indexer is not None:
+        try:
+            mode_index = indexer.close()
+        except Exception:
+            pass
+    return digest.hexdigest(), mode_index
+
+
+def to_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Converts a DataFrame to JSON records, with NaN (e.g. a missing neighbouring mode) as null.
+    """
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+
+def format_result(result: Dict[str, Any], model_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Converts the output of scripts.main.main into the /predict response data.
+    """
+    # Convert DataFrame to dict if it exists
+    response_data = {}
+    if "Results" in result and hasattr(result["Results"], "to_dict"):
+        response_data["results"] = to_records(result["Results"])
+    if "Mode metrics" in result:
+        # Per-mode metrics the classification was made from, one record per mode
+        response_data["mode_metrics"] = to_records(result["Mode metrics"].reset_index())
+
+    # Add other result fields
+    if "Modal Separation Target" in result:
+        response_data["modal_target"] = result["Modal Separation Target"]
+    if "Minimum separation (Hz)" in result:
+        min_separation = result["Minimum separation (Hz)"]
+        response_data["min_separation"] = None if pd.isna(min_separation) else min_separation
+    if "Inplane modes" in result:
+        response_data["inplane_modes"] = result["Inplane modes"]
+    if "Out-of-plane modes" in result:
+        response_data["out_of_plane_modes"] = result["Out-of-plane modes"]
+    if model_id is not None:
+        response_data["model_id"] = model_id
+    if "Model cached" in result:
+        response_data["model_cached"] = result["Model cached"]
+    if "Profile" in result:
+        response_data["profile"] = result["Profile"]
+
+    return response_data
+
+
+def run_predict(
+    dat_path: str,
+    inp_path: str,
+    mode_index: Optional[Dict[int, Tuple[int, int]]] = None,
+    cache_dir: Optional[str] = None,
+    cache_key: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None,
+    profile: bool = False,
+) -> Dict[str, Any]:
+    """
+    Runs the analysis of one upload in a worker process and returns the /predict response data.
+    With a cache_dir, the parsed model and its per-mode metrics are stored in the ResultCache there.
+    With profile, the response data includes the stage timings of the analysis (core.profiling.Profiler.report).
+    """
+    result_cache = ResultCache(cache_dir) if cache_dir is not None else None
+    result = main(
+        dat_path,
+        inp_path,
+        cache_dir=str(result_cache.model_dir) if result_cache is not None else None,
+        mode_index=mode_index,
+        cache_key=cache_key,
+        profile=profile,
+        **(params or {}),
+    )
+    if result_cache is not None:
+        result_cache.put_metrics(cache_key, result["Mode metrics"], result["Mode table"])
+    return format_result(result, model_id=cache_key)
+
+
+# Response fields that only describe the run that produced a result, so they are not cached with it
+RUN_FIELDS = ("profile", "model_cached")
+
+
+def strip_run_fields(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns the response data without its RUN_FIELDS.
+    """
+    return {key: value for key, value in result.items() if key not in RUN_FIELDS}
+
+
+def store_result(result_cache: ResultCache, result_key: str, result: Dict[str, Any]) -> None:
+    """
+    Stores the result of a finished analysis and counts whether it loaded its model from the cache.
+    """
+    if "model_cached" in result:
+        result_cache.count_model(result["model_cached"])
+    result_cache.put_result(result_key, strip_run_fields(result))
+
+
+def server_timing(profile: Dict[str, Any]) -> str:
+    """
+    Formats the stage timings of a profile as a Server-Timing header, shown by browser developer tools.
+    """
+    metrics = [f"{name};dur={stats['total_s'] * 1000:.1f}" for name, stats in profile["stages"].items()]
+    if profile.get("total_s") is not None:
+        metrics.append(f"total;dur={profile['total_s'] * 1000:.1f}")
+    return ", ".join(metrics)
+
+
+class ReclassifyRequest(BaseModel):
+    # A model key (core.parser.modelCache.model_key), which also names the cached files, so never a path
+    model_id: str = Field(pattern=r"^[0-9a-f]{64}$")
+    oop_thres: float = 90
+    near_inplane_thres: float = 300
+    tang_ratio_thres: float = TANG_RATIO_THRES
+    rigid_ratio_thres: float = RIGID_RATIO_THRES
+
 
 def register_routes(app: FastAPI):
-    @app.post("/predict")
+    @app.post("/predict", status_code=202)
     async def predict(
         dat_file: UploadFile = File(..., description="DAT file upload"),
         inp_file: UploadFile = File(..., description="INP file upload"),
+        oop_thres: float = Form(90, description="Out-of-plane proportion threshold (%)"),
+        near_inplane_thres: float = Form(300, description="Minimum separation between in-plane and out-of-plane modes (Hz)"),
+        tang_ratio_thres: float = Form(TANG_RATIO_THRES, description="Tangential-to-radial energy ratio of in-plane modes"),
+        rigid_ratio_thres: float = Form(RIGID_RATIO_THRES, description="Rigid rotation ratio above which a mode is excluded"),
+        profile: bool = Form(False, description="Report the stage timings and peak memory of the analysis"),
     ) -> Dict[str, Any]:
         # Validate file uploads
         if not dat_file.filename or not inp_file.filename:
@@ -20,46 +183,118 @@ def register_routes(app: FastAPI):
                 status_code=400, detail="Please upload both dat_file and inp_file"
             )
 
-        # Get upload directory from app state
-        upload_dir = app.state.upload_folder
+        job_queue = app.state.job_queue
+        result_cache = app.state.result_cache
+        # Reject before saving the uploads if no job can be queued
+        if job_queue.is_full():
+            raise HTTPException(status_code=429, detail="Too many analyses in progress. Please retry later.")
+
+        # Every job gets its own upload directory, so concurrent uploads of the same file names do not collide
+        job_id = job_queue.new_job_id()
+        upload_dir = app.state.upload_folder / job_id
+        upload_dir.mkdir(parents=True, exist_ok=True)
 
         # Create secure file paths
-        dat_path = upload_dir / dat_file.filename
-        inp_path = upload_dir / inp_file.filename
+        dat_path = upload_dir / Path(dat_file.filename).name
+        inp_path = upload_dir / Path(inp_file.filename).name
 
         try:
-            # Save uploaded files
-            with open(dat_path, "wb") as f:
-                content = await dat_file.read()
-                f.write(content)
-
-            with open(inp_path, "wb") as f:
-                content = await inp_file.read()
-                f.write(content)
-
-            # Process the files
-            result = main(str(dat_path), str(inp_path))
+            # Copy the received files to the job directory, hashing them and indexing the .dat eigenvector tables on the way
+            dat_digest, mode_index = await run_in_threadpool(save_upload, dat_file.file, dat_path, index_dat=True)
+            inp_digest, _ = await run_in_threadpool(save_upload, inp_file.file, inp_path)
 
-            # Convert DataFrame to dict if it exists
-            response_data = {}
-            if "Results" in result and hasattr(result["Results"], "to_dict"):
-                response_data["results"] = result["Results"].to_dict(orient="records")
+            # Identical requests are answered from the cache
+            cache_key = model_key(dat_digest, inp_digest)
+            params = {
+                "oop_thres": oop_thres,
+                "near_inplane_thres": near_inplane_thres,
+                "tang_ratio_thres": tang_ratio_thres,
+                "rigid_ratio_thres": rigid_ratio_thres,
+            }
+            result_key = result_cache.result_key(cache_key, params)
+            # A profiled request measures a real run, so it is never answered from the cache
+            cached = None if profile else result_cache.get_result(result_key)
+            if cached is not None:
+                shutil.rmtree(upload_dir, ignore_errors=True)
+                job_queue.add_done(job_id, cached)
+                return {"job_id": job_id, "status": "done"}
 
-            # Add other result fields
-            if "Modal Separation Target" in result:
-                response_data["modal_target"] = result["Modal Separation Target"]
-            if "Inplane modes" in result:
-                response_data["inplane_modes"] = result["Inplane modes"]
-            if "Out-of-plane modes" in result:
-                response_data["out_of_plane_modes"] = result["Out-of-plane modes"]
+            # Process the files in the worker pool; a cached parsed model is reused when only thresholds differ
+            job_queue.submit(
+                job_id,
+                run_predict,
+                str(dat_path),
+                str(inp_path),
+                mode_index,
+                str(result_cache.cache_dir),
+                cache_key,
+                params,
+                profile,
+                on_result=lambda result: store_result(result_cache, result_key, result),
+                # The uploads are only needed by the worker
+                on_done=lambda: shutil.rmtree(upload_dir, ignore_errors=True),
+            )
 
-            return response_data
+        except QueueFullError as e:
+            shutil.rmtree(upload_dir, ignore_errors=True)
+            raise HTTPException(status_code=429, detail=str(e))
 
         except Exception as e:
+            shutil.rmtree(upload_dir, ignore_errors=True)
             raise HTTPException(status_code=500, detail=str(e))
 
-        finally:
-            # Optional: Clean up uploaded files after processing
-            # dat_path.unlink(missing_ok=True)
-            # inp_path.unlink(missing_ok=True)
-            pass
+        return {"job_id": job_id, "status": "queued"}
+
+    @app.get("/jobs/{job_id}")
+    async def get_job(job_id: str) -> Dict[str, Any]:
+        job = app.state.job_queue.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+        profile = job.get("result", {}).get("profile")
+        if profile is not None:
+            return JSONResponse(job, headers={"Server-Timing": server_timing(profile)})
+        return job
+
+    @app.post("/reclassify")
+    async def reclassify(request: ReclassifyRequest) -> Dict[str, Any]:
+        """
+        Re-classifies a previously analysed model (model_id from /predict) with other thresholds,
+        from its cached per-mode metrics, without its files.
+        """
+        cached = app.state.result_cache.get_metrics(request.model_id)
+        if cached is None:
+            raise HTTPException(status_code=404, detail=f"Model {request.model_id} not found. Please upload its files again.")
+        mode_metrics, mode_table_df = cached
+
+        analyser = ModalAnalyser.from_metrics(
+            mode_metrics,
+            mode_table_df,
+            oop_thres=request.oop_thres,
+            near_inplane_thres=request.near_inplane_thres,
+            tang_ratio_thres=request.tang_ratio_thres,
+            rigid_ratio_thres=request.rigid_ratio_thres,
+        )
+        passed = analyser.get_results()
+        return format_result(
+            {
+                "Results": analyser.results,
+                "Inplane modes": analyser.inplane_modes,
+                "Out-of-plane modes": analyser.outplane_modes,
+                "Modal Separation Target": "Met" if passed else "Not met",
+                "Minimum separation (Hz)": analyser.min_separation,
+                "Mode metrics": analyser.get_mode_metrics(),
+            },
+            model_id=request.model_id,
+        )
+
+    @app.get("/metrics")
+    async def metrics() -> Dict[str, Any]:
+        job_queue = app.state.job_queue
+        return {
+            "jobs": {
+                "pending": job_queue.pending(),
+                "max_workers": job_queue.max_workers,
+                "max_queue": job_queue.max_queue,
+            },
+            "cache": app.state.result_cache.info(),
+        }
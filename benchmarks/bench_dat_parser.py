@@ -0,0 +1,47 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.synthetic import write_dat
+from core.parser.datParser import DATParser, PARSER_ENGINES
+
+
+def time_engine(dat_file: str, parser_engine: str, repeat: int) -> tuple[float, np.ndarray]:
+    best = float("inf")
+    for _ in range(repeat):
+        parser = DATParser(dat_file, parser_engine=parser_engine)
+        start = time.perf_counter()
+        tables = [parser.get_mode_array(mode_no) for mode_no in sorted(parser.mode_index)]
+        best = min(best, time.perf_counter() - start)
+    return best, np.stack(tables)
+
+
+def main(n_nodes: int, n_modes: int, repeat: int, dat_file: str | None = None):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if dat_file is None:
+            dat_file = str(Path(tmp_dir) / "synthetic.dat")
+            print(f"Writing synthetic .dat with {n_nodes} nodes and {n_modes} modes...")
+            write_dat(dat_file, n_nodes, n_modes)
+
+        results = {engine: time_engine(dat_file, engine, repeat) for engine in PARSER_ENGINES}
+
+    reference = results["pandas"]
+    n_rows = reference[1].shape[0] * reference[1].shape[1]
+    for engine, (seconds, tables) in results.items():
+        print(
+            f"{engine:>8}: {seconds:8.3f} s  {n_rows / seconds / 1e6:6.2f} M rows/s  "
+            f"speedup x{reference[0] / seconds:5.2f}  max |diff| {np.abs(tables - reference[1]).max():.1e}"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark DATParser eigenvector table parsing engines.")
+    parser.add_argument("--nodes", type=int, default=200000, help="Number of nodes of the synthetic model")
+    parser.add_argument("--modes", type=int, default=10, help="Number of modes of the synthetic model")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs per engine (best is kept)")
+    parser.add_argument("-dat", "--dat_path", help="Benchmark an existing .dat file instead")
+    args = parser.parse_args()
+
+    main(args.nodes, args.modes, args.repeat, args.dat_path)
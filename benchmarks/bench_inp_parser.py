@@ -0,0 +1,67 @@
+import argparse
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import write_inp
+from core.parser.inpParser import INPParser
+
+
+def regex_str_to_df(contents: str) -> pd.DataFrame:
+    """
+    Reference: node parsing as INPParser did before, through pandas' python engine with a regex separator.
+    """
+    table = INPParser.extract_str(contents, "*NODE", "**HWCOLOR COMP")
+    return pd.read_csv(
+        StringIO(table),
+        sep=r'[,\s]+',
+        header=None,
+        names=['node_no', 'x', 'y', 'z'],
+        engine='python'
+    )
+
+
+def time_parser(str_to_df, contents: str, repeat: int) -> tuple[float, pd.DataFrame]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        node_df = str_to_df(contents)
+        best = min(best, time.perf_counter() - start)
+    return best, node_df
+
+
+def main(n_nodes: int, repeat: int, inp_file: str | None = None):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if inp_file is None:
+            inp_file = str(Path(tmp_dir) / "synthetic.inp")
+            print(f"Writing synthetic .inp with {n_nodes} nodes...")
+            write_inp(inp_file, n_nodes)
+        with open(inp_file, "r") as file:
+            contents = file.read()
+
+    results = {
+        "regex": time_parser(regex_str_to_df, contents, repeat),
+        "fast": time_parser(INPParser.str_to_df, contents, repeat),
+    }
+
+    reference = results["regex"]
+    n_lines = len(reference[1])
+    for name, (seconds, node_df) in results.items():
+        diff = np.abs(node_df.to_numpy(dtype=np.float64) - reference[1].to_numpy(dtype=np.float64)).max()
+        print(
+            f"{name:>6}: {seconds:8.3f} s  {n_lines / seconds / 1e6:6.2f} M lines/s  "
+            f"speedup x{reference[0] / seconds:6.2f}  max |diff| {diff:.1e}"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark INPParser *NODE parsing against the regex-based reader.")
+    parser.add_argument("--nodes", type=int, default=500000, help="Number of nodes of the synthetic model")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs per parser (best is kept)")
+    parser.add_argument("-inp", "--inp_path", help="Benchmark an existing .inp file (single *NODE block ending at **HWCOLOR COMP) instead")
+    args = parser.parse_args()
+
+    main(args.nodes, args.repeat, args.inp_path)
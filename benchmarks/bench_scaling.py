@@ -0,0 +1,111 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import write_model
+from core.analyser.modalAnalyser import ModalAnalyser
+from core.parser.datParser import DATParser
+from core.parser.inpParser import INPParser
+from core.parser.modalParser import ModalParser
+from core.profiling import Profiler
+
+DEFAULT_NODES = [10000, 100000, 1000000, 5000000]
+
+
+def run_dat_parser(dat_file, inp_file, use_mmap):
+    # Index the file, then parse every eigenvector table into one array
+    DATParser(dat_file, use_mmap=use_mmap).get_displacements()
+
+
+def run_inp_parser(dat_file, inp_file, use_mmap):
+    INPParser(inp_file, use_mmap=use_mmap)
+
+
+def run_modal_parser(dat_file, inp_file, use_mmap):
+    # Parsing both files and matching the nodes of the .dat tables to the .inp nodes
+    ModalParser(dat_file, inp_file, use_mmap=use_mmap).geometry
+
+
+def run_get_results(dat_file, inp_file, use_mmap):
+    # End to end, as scripts.main runs it
+    with contextlib.redirect_stdout(io.StringIO()):
+        ModalAnalyser(ModalParser(dat_file, inp_file, use_mmap=use_mmap)).get_results()
+
+
+BENCHMARKS = {
+    "DATParser": run_dat_parser,
+    "INPParser": run_inp_parser,
+    "ModalParser": run_modal_parser,
+    "ModalAnalyser.get_results": run_get_results,
+}
+
+
+def time_benchmark(fn, dat_file, inp_file, use_mmap, repeat):
+    """
+    Returns the best wall time of repeat runs and the per-stage profile of the best run.
+    """
+    best, best_profile = float("inf"), None
+    for _ in range(repeat):
+        with Profiler(trace_memory=False) as profiler:
+            fn(dat_file, inp_file, use_mmap)
+        if profiler.total_s < best:
+            best, best_profile = profiler.total_s, profiler.report()
+    return best, best_profile
+
+
+def main(node_counts, n_modes, repeat, benchmarks, use_mmap=False, output_path=None, work_dir=None):
+    rows = []
+    profiles = {}
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp_dir:
+        for n_nodes in node_counts:
+            print(f"Writing synthetic model with {n_nodes} nodes and {n_modes} modes...")
+            start = time.perf_counter()
+            dat_file, inp_file = write_model(tmp_dir, f"model_{n_nodes}", n_nodes, n_modes)
+            dat_mb = os.path.getsize(dat_file) / (1024 * 1024)
+            print(f"  written in {time.perf_counter() - start:.1f} s (.dat {dat_mb:.0f} MB)")
+
+            for name in benchmarks:
+                seconds, profile = time_benchmark(BENCHMARKS[name], dat_file, inp_file, use_mmap, repeat)
+                rows.append({
+                    "benchmark": name,
+                    "nodes": n_nodes,
+                    "modes": n_modes,
+                    "dat_mb": dat_mb,
+                    "seconds": seconds,
+                    "M_nodes_per_s": n_nodes / seconds / 1e6,
+                })
+                profiles[f"{name}/{n_nodes}"] = profile
+                print(f"  {name:>26}: {seconds:9.3f} s  {rows[-1]['M_nodes_per_s']:7.2f} M nodes/s")
+
+            # Models of the largest sizes take gigabytes, so only one is kept on disk at a time
+            os.remove(dat_file)
+            os.remove(inp_file)
+
+    results = pd.DataFrame(rows)
+    print()
+    print(results.pivot(index="nodes", columns="benchmark", values="seconds")[list(benchmarks)].to_string(float_format="%.3f"))
+
+    if output_path is not None:
+        with open(output_path, "w") as f:
+            json.dump({"results": rows, "profiles": profiles}, f, indent=2)
+        print(f"Results and per-stage profiles written to {output_path}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the parsers and the analysis on synthetic models of increasing size.")
+    parser.add_argument("--nodes", type=int, nargs="+", default=DEFAULT_NODES, help="Node counts of the synthetic models")
+    parser.add_argument("--modes", type=int, default=10, help="Number of modes of the synthetic models")
+    parser.add_argument("--repeat", type=int, default=1, help="Number of timed runs per benchmark (best is kept)")
+    parser.add_argument("--bench", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS), help="Benchmarks to run")
+    parser.add_argument("--mmap", action="store_true", help="Memory-map the files instead of reading them into memory")
+    parser.add_argument("-o", "--output", help="Write the timings and per-stage profiles to this JSON file")
+    parser.add_argument("--work_dir", help="Folder for the synthetic models (default: system temp folder)")
+    args = parser.parse_args()
+
+    main(args.nodes, args.modes, args.repeat, args.bench, use_mmap=args.mmap, output_path=args.output, work_dir=args.work_dir)
@@ -0,0 +1,64 @@
+import argparse
+import contextlib
+import io
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import write_model
+from core.analyser.modalAnalyser import ENGINES, ModalAnalyser
+from core.parser.modalParser import ModalParser
+
+
+def analyse(dat_file, inp_file, dtype, engine, use_mmap):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = ModalParser(dat_file, inp_file, use_mmap=use_mmap, dtype=dtype)
+        analyser = ModalAnalyser(model, engine=engine)
+        passed = analyser.get_results()
+    seconds = time.perf_counter() - start
+    # Memory held by the model: node table and the displacements it has parsed (all modes when batched)
+    nbytes = model.node_df.memory_usage(index=False).sum() + model.cache_info()["size_mb"] * 2**20
+    if engine == "batched":
+        nbytes += model.get_displacements()[1].nbytes
+    return analyser, passed, seconds, nbytes
+
+
+def compare(dat_file, inp_file, engine, use_mmap):
+    """
+    Analyses a model in float64 and float32. Returns True if the classification is the same.
+    """
+    reference, ref_passed, ref_s, ref_bytes = analyse(dat_file, inp_file, "float64", engine, use_mmap)
+    compact, passed, compact_s, compact_bytes = analyse(dat_file, inp_file, "float32", engine, use_mmap)
+
+    same = (
+        compact.inplane_modes == reference.inplane_modes
+        and compact.outplane_modes == reference.outplane_modes
+        and passed == ref_passed
+    )
+    diff = (compact.get_mode_metrics() - reference.get_mode_metrics()).abs()
+    print(f"{dat_file}")
+    print(f"  classification: {'same' if same else 'DIFFERENT'} (in-plane {compact.inplane_modes}, out-of-plane {compact.outplane_modes})")
+    print(f"  max |diff| oop/ip: {diff[['oop', 'ip']].to_numpy().max():.2e} %  min separation: {abs(compact.min_separation - reference.min_separation):.2e} Hz")
+    print(f"  model memory: {ref_bytes / 2**20:8.1f} MB -> {compact_bytes / 2**20:8.1f} MB")
+    print(f"  time:         {ref_s:8.2f} s  -> {compact_s:8.2f} s")
+    return same
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that float32 models (ModalParser(dtype='float32')) classify modes as float64 ones do.")
+    parser.add_argument("--pair", nargs=2, action="append", metavar=("DAT", "INP"), help="A real .dat/.inp pair to check (repeatable)")
+    parser.add_argument("--nodes", type=int, nargs="*", default=[100000, 1000000], help="Node counts of synthetic models to check")
+    parser.add_argument("--modes", type=int, default=10, help="Number of modes of the synthetic models")
+    parser.add_argument("--engine", choices=ENGINES, default="batched", help="ModalAnalyser engine")
+    parser.add_argument("--mmap", action="store_true", help="Memory-map the files")
+    args = parser.parse_args()
+
+    all_same = True
+    for dat_file, inp_file in args.pair or []:
+        all_same &= compare(dat_file, inp_file, args.engine, args.mmap)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n_nodes in args.nodes:
+            dat_file, inp_file = write_model(tmp_dir, f"model_{n_nodes}", n_nodes, args.modes)
+            all_same &= compare(dat_file, inp_file, args.engine, args.mmap)
+
+    sys.exit(0 if all_same else 1)
@@ -0,0 +1,123 @@
+import argparse
+import os
+
+import numpy as np
+
+WRITE_CHUNK_ROWS = 100000
+
+
+def rotor_nodes(n_nodes: int, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Generates nodes of a brake-rotor-like annular disc in the x-z plane, with thickness along y.
+
+    Returns:
+    tuple: (node_numbers, xyz)
+        node_numbers: (n_nodes,) increasing, non-contiguous node numbers
+        xyz: (n_nodes, 3) node coordinates
+    """
+    rng = np.random.default_rng(seed)
+    theta = rng.uniform(0, 2 * np.pi, n_nodes)
+    radius = rng.uniform(80, 150, n_nodes)
+    xyz = np.stack(
+        [radius * np.cos(theta), rng.uniform(0, 20, n_nodes), radius * np.sin(theta)], axis=1
+    )
+    node_numbers = np.arange(1, n_nodes + 1) * 3
+    return node_numbers, xyz
+
+
+def mode_shape(mode_no: int, xyz: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    Returns a (n_nodes, 3) mode shape cycling through out-of-plane, in-plane tangential and
+    in-plane radial families with increasing nodal diameters.
+    """
+    rx, rz = xyz[:, 0] - xyz[:, 0].mean(), xyz[:, 2] - xyz[:, 2].mean()
+    r_len = np.hypot(rx, rz)
+    theta = np.arctan2(rz, rx)
+    wave = np.cos((mode_no // 3 % 8 + 1) * theta)
+    noise = rng.normal(0, 0.02, (len(xyz), 3))
+
+    family = mode_no % 3
+    if family == 1:  # out-of-plane
+        return np.stack([noise[:, 0], wave, noise[:, 2]], axis=1)
+    if family == 2:  # in-plane tangential
+        return np.stack([3 * wave * rz / r_len, 0.1 * noise[:, 1], -3 * wave * rx / r_len], axis=1)
+    return np.stack([wave * rx / r_len, noise[:, 1], wave * rz / r_len], axis=1)  # in-plane radial
+
+
+def _write_rows(file, fmt: str, columns: list[np.ndarray]) -> None:
+    n_rows = len(columns[0])
+    for start in range(0, n_rows, WRITE_CHUNK_ROWS):
+        stop = min(start + WRITE_CHUNK_ROWS, n_rows)
+        rows = np.stack([c[start:stop] for c in columns], axis=1).astype(object).ravel()
+        file.write((fmt * (stop - start)) % tuple(rows))
+
+
+def write_dat(dat_file: str, n_nodes: int, n_modes: int, seed: int = 0) -> None:
+    """
+    Writes a synthetic Abaqus frequency-step .dat file with an eigenvalue output table and one
+    eigenvector table (with MAXIMUM/AT NODE footers) per mode.
+    """
+    node_numbers, xyz = rotor_nodes(n_nodes, seed)
+    rng = np.random.default_rng(seed + 1)
+    freqs = np.sort(rng.uniform(500, 12000, n_modes))
+
+    with open(dat_file, "w") as file:
+        file.write("\n   Abaqus synthetic benchmark model\n" + "\n" * 3)
+        file.write("                                     E I G E N V A L U E    O U T P U T\n \n \n")
+        file.write(" MODE NO      EIGENVALUE              FREQUENCY         GENERALIZED MASS   COMPOSITE MODAL DAMPING\n")
+        file.write("                                  (RAD/TIME)   (CYCLES/TIME)\n\n\n")
+        omega = 2 * np.pi * freqs
+        for mode_no in range(1, n_modes + 1):
+            w = omega[mode_no - 1]
+            file.write(f"  {mode_no:6d}  {w * w:13.6E}  {w:13.6E}  {freqs[mode_no - 1]:13.6E}  {1.0:13.6E}  {0.0:13.6E}\n")
+        file.write("\n\n\n")
+
+        for mode_no in range(1, n_modes + 1):
+            U = mode_shape(mode_no, xyz, rng)
+            file.write(f"\n                                         E I G E N V A L U E    N U M B E R{mode_no:6d}\n\n\n")
+            file.write(" THE FOLLOWING TABLE IS PRINTED FOR ALL NODES\n\n")
+            file.write("    NODE FOOT-       U1             U2             U3\n         NOTE\n  \n")
+            _write_rows(file, "%11d     %12.5E   %12.5E   %12.5E\n", [node_numbers, U[:, 0], U[:, 1], U[:, 2]])
+            peak = np.abs(U).argmax(axis=0)
+            file.write(f"\n MAXIMUM         {U[peak[0], 0]:12.5E}   {U[peak[1], 1]:12.5E}   {U[peak[2], 2]:12.5E}\n")
+            file.write(f" AT NODE         {node_numbers[peak[0]]:12d}   {node_numbers[peak[1]]:12d}   {node_numbers[peak[2]]:12d}\n  \n\n")
+
+
+def write_inp(inp_file: str, n_nodes: int, seed: int = 0) -> None:
+    """
+    Writes a synthetic HyperMesh-style Abaqus .inp file with one *NODE block (ending at a **HWCOLOR COMP
+    comment) and a steel material with *DENSITY and *ELASTIC, TYPE = ISOTROPIC.
+    """
+    node_numbers, xyz = rotor_nodes(n_nodes, seed)
+    with open(inp_file, "w") as file:
+        file.write("**\n** Abaqus synthetic benchmark model\n**\n*NODE\n")
+        _write_rows(file, "%8d,%16.8E,%16.8E,%16.8E\n", [node_numbers, xyz[:, 0], xyz[:, 1], xyz[:, 2]])
+        file.write("**HWCOLOR COMP          1     5\n")
+        file.write("*MATERIAL, NAME=STEEL\n*DENSITY\n 7.2E-09,\n*ELASTIC, TYPE = ISOTROPIC\n 210000.0, 0.3\n")
+
+
+def write_model(out_dir: str, name: str, n_nodes: int, n_modes: int, seed: int = 0) -> tuple[str, str]:
+    """
+    Writes a matching synthetic <name>.dat/<name>.inp pair to out_dir.
+
+    Returns:
+    tuple: (dat_file, inp_file)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    dat_file = os.path.join(out_dir, f"{name}.dat")
+    inp_file = os.path.join(out_dir, f"{name}.inp")
+    write_dat(dat_file, n_nodes, n_modes, seed)
+    write_inp(inp_file, n_nodes, seed)
+    return dat_file, inp_file
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic Abaqus .dat/.inp model pair.")
+    parser.add_argument("--nodes", type=int, default=10000, help="Number of nodes")
+    parser.add_argument("--modes", type=int, default=10, help="Number of modes")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--name", default="synthetic", help="File name, without extension")
+    parser.add_argument("-o", "--output_dir", default=".", help="Folder to write the files to")
+    args = parser.parse_args()
+
+    dat_file, inp_file = write_model(args.output_dir, args.name, args.nodes, args.modes, args.seed)
+    print(f"Wrote {dat_file} and {inp_file}")
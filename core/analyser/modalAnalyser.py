@@ -1,39 +1,100 @@
 import numpy as np
 import pandas as pd
 from core.parser.modalParser import ModalParser  # safe to remove
+from core.profiling import profiled, stage
+
+TANG_RATIO_THRES = 2.0
+RIGID_RATIO_THRES = 0.1
+ENGINES = ("batched", "per_mode", "streaming")
 
 
 class ModalAnalyser:
     def __init__(
-        self, model: ModalParser, oop_thres: int = 90, near_inplane_thres: int = 300
+        self,
+        model: ModalParser,
+        oop_thres: int = 90,
+        near_inplane_thres: int = 300,
+        engine: str = "batched",
+        tang_ratio_thres: float = TANG_RATIO_THRES,
+        rigid_ratio_thres: float = RIGID_RATIO_THRES,
+        chunk_size: int = 100000,
     ) -> "ModalAnalyser":
         """
         Initializes Modal Analyser class.
 
         Parameters:
         model (ModalParser):
-            The modal parser instance.
+            The modal parser instance. None for analysers created with from_metrics.
         oop_thres (int):
             Out-of-plane threshold.
             This threshold determines the minimum out-of-plane proportion required to classify a mode as out-of-plane.
         near_inplane_thres (int):
             Near in-plane threshold.
             This threshold determines how close an out-of-plane should not be to an in-plane mode.
+        engine (str):
+            How get_mode_metrics computes the metrics table that all classification reads from.
+            "batched" parses the displacement array of all modes at once, then computes the metrics from it
+            one mode at a time.
+            "per_mode" parses and analyses one mode at a time, using less memory on very large models.
+            "streaming" reads every mode in chunks of chunk_size nodes, so memory stays bounded by one chunk
+            (plus the node geometry) for models larger than memory. Modes are not cached.
+        tang_ratio_thres (float):
+            Tangential-to-radial energy ratio above which a mode is tangential (see is_tangential).
+        rigid_ratio_thres (float):
+            Rigid body rotation ratio above which a mode is a rigid rotation (see is_rigid_rotation).
+        chunk_size (int):
+            Number of nodes read at a time by the "streaming" engine.
         """
+        if engine not in ENGINES:
+            raise ValueError(f"engine must be one of {ENGINES}. Provided: {engine}")
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be at least 1. Provided: {chunk_size}")
 
         self.model = model
-        self.mode_table = model.mode_table_df.set_index("mode_no")
-        self.max = model.max_modes
+        if model is not None:
+            self.mode_table = model.mode_table_df.set_index("mode_no")
+            self.max = model.max_modes
 
         self.oop_thres = oop_thres
         self.near_inplane_thres = near_inplane_thres
+        self.tang_ratio_thres = tang_ratio_thres
+        self.rigid_ratio_thres = rigid_ratio_thres
+        self.engine = engine
+        self.chunk_size = chunk_size
 
         self.inplane_modes = None
         self.outplane_modes = None
+        self.mode_metrics = None
+        self.results = None
+
+    @classmethod
+    def from_metrics(cls, mode_metrics: pd.DataFrame, mode_table_df: pd.DataFrame, **thresholds) -> "ModalAnalyser":
+        """
+        Creates an analyser that classifies modes from previously computed metrics, without a model,
+        e.g. to re-classify a model with other thresholds.
+
+        Parameters:
+        mode_metrics (pd.DataFrame): Metrics of every mode, as returned by get_mode_metrics.
+        mode_table_df (pd.DataFrame): DataFrame ['mode_no', 'freq'] of the model (ModalParser.mode_table_df).
+        thresholds: oop_thres, near_inplane_thres, tang_ratio_thres and rigid_ratio_thres, as for __init__.
+        """
+        analyser = cls(None, engine="batched", **thresholds)
+        analyser.mode_table = mode_table_df.set_index("mode_no")
+        analyser.max = mode_table_df["mode_no"].max().item()
+        if "freq" not in mode_metrics:
+            mode_metrics = mode_metrics.assign(freq=analyser.mode_table["freq"].reindex(mode_metrics.index))
+        analyser.mode_metrics = mode_metrics
+        return analyser
 
     def get_freq(self, n: int) -> float:
         return self.mode_table.loc[n].item()
 
+    def _metric(self, n: int, column: str) -> float:
+        metrics = self.get_mode_metrics()
+        if n not in metrics.index:
+            raise ValueError(f"Mode number {n} not found.")
+        return metrics.at[n, column]
+
     def get_proportions(
         self, n: int
     ) -> tuple[float, float, float, float, float, float]:
@@ -52,64 +113,36 @@ class ModalAnalyser:
             sq_z: squared displacement in z-direction
             resultant: resultant displacement
         """
-        mode_df = self.model(n)
-        mode_df = mode_df[mode_df["U2"] >= 0].copy()
-
-        sq_x = mode_df["U1"] ** 2
-        sq_y = mode_df["U2"] ** 2
-        sq_z = mode_df["U3"] ** 2
-
-        sumsq_x = sq_x.sum()
-        sumsq_y = sq_y.sum()
-        sumsq_z = sq_z.sum()
-
-        resultant = np.sqrt(sq_x + sq_y + sq_z).sum()
-
-        total_energy = sumsq_x + sumsq_y + sumsq_z
-
-        oop = ((sumsq_y) / total_energy) * 100
-        ip = ((sumsq_x + sumsq_z) / total_energy) * 100
-
-        return oop, ip, sumsq_x, sumsq_y, sumsq_z, resultant
-
-    def is_tangential(self, n: int, tang_ratio_thres: float = 2.0) -> bool:
+        metrics = self.get_mode_metrics()
+        if n not in metrics.index:
+            raise ValueError(f"Mode number {n} not found.")
+        row = metrics.loc[n]
+        return row["oop"], row["ip"], row["sumsq_x"], row["sumsq_y"], row["sumsq_z"], row["resultant"]
+
+    def is_tangential(
+        self, n: int, tang_ratio_thres: float | None = None, return_ratio: bool = False
+    ) -> bool:
         """
-        Checks if the mode is tangential. Calculates the tangential-to-radial displacement ratio.
-        Takes radial, normal and tangential unit vectors, then computes the displacement components.
+        Checks if the mode is tangential, from its tangential-to-radial displacement energy ratio Et / Er
+        (the tang_ratio metric).
 
         Parameters:
         n (int): The mode number to analyze.
-        tang_ratio_thres (float): The threshold ratio to determine if the mode is tangential. Default is 2.0.
+        tang_ratio_thres (float): The threshold ratio to determine if the mode is tangential. Default is the analyser's tang_ratio_thres.
+        return_ratio (bool): Whether to also return the ratio. Default is False.
 
         Returns:
         bool: True if the mode is tangential, False otherwise.
         """
-        df = self.model(n)
-        ctr_x = df.x.mean()
-        ctr_z = df.z.mean()
-
-        r_vec = np.stack([df.x - ctr_x, 0 * df.x, df.z - ctr_z]).T
-        r_len = np.linalg.norm(r_vec, axis=1)
-        r_hat = (r_vec.T / r_len).T  # shape (N,3)
-        t_hat = np.cross(np.array([0, 1, 0]), r_hat)  # (N,3)
-
-        U = np.stack([df.U1, df.U2, df.U3]).T
-        u_r = np.sum(U * r_hat, axis=1)
-        u_t = np.sum(U * t_hat, axis=1)
-
-        Er = np.sum(u_r**2)
-        Et = np.sum(u_t**2)
-        ratio = Et / Er
-
-        if ratio > tang_ratio_thres:
-            return True
-        elif ratio < 1 / tang_ratio_thres:
-            return False
-        else:
-            return False
+        if tang_ratio_thres is None:
+            tang_ratio_thres = self.tang_ratio_thres
+        ratio = self._metric(n, "tang_ratio")
+        # An undefined ratio (NaN) is not tangential
+        flag = bool(ratio > tang_ratio_thres)
+        return (flag, float(ratio)) if return_ratio else flag
 
     def is_rigid_rotation(
-        self, n: int, rigid_ratio_thres: float = 0.1, return_ratio: bool = False
+        self, n: int, rigid_ratio_thres: float | None = None, return_ratio: bool = False
     ) -> bool:
         """
         Checks if the mode is undergoing rigid body rotation. Some modes move in one continuous clockwise/anti-clockwise motion -
@@ -117,33 +150,159 @@ class ModalAnalyser:
 
         Parameters:
         n (int): The mode number to analyze.
-        rigid_ratio_thres (float): The threshold ratio to determine if the mode is undergoing rigid body rotation. Default is 0.1.
+        rigid_ratio_thres (float): The threshold ratio to determine if the mode is undergoing rigid body rotation. Default is the analyser's rigid_ratio_thres.
         return_ratio (bool): Whether to return the rotation ratio instead of just True/False. Default is False.
 
         Returns:
         bool: True if the mode is undergoing rigid body rotation, False otherwise.
         """
-        df = self.model(n)
+        if rigid_ratio_thres is None:
+            rigid_ratio_thres = self.rigid_ratio_thres
+        rho = self._metric(n, "rigid_rho")
+        flag = bool(rho > rigid_ratio_thres)
+        return (flag, float(rho)) if return_ratio else flag
+
+    @staticmethod
+    def sufficient_statistics(U: np.ndarray, r_hat: np.ndarray, t_hat: np.ndarray) -> dict[str, np.ndarray]:
+        """
+        Computes the per-mode sums the metrics are made from. Sums over disjoint sets of nodes add up,
+        so a mode can be processed in node chunks and the chunk statistics summed.
 
-        ctr_x = df["x"].mean()
-        ctr_z = df["z"].mean()
+        Parameters:
+        U (np.ndarray): (n_modes, n, 3) displacements [U1, U2, U3] of n nodes.
+        r_hat (np.ndarray): (n, 3) radial unit vectors of the nodes.
+        t_hat (np.ndarray): (n, 3) tangential unit vectors of the nodes.
+
+        Returns:
+        dict: (n_modes,) arrays (sumsq: (n_modes, 3))
+            sumsq: sums of U1^2, U2^2, U3^2 over nodes with U2 >= 0
+            resultant: sum of the resultant displacements of nodes with U2 >= 0
+            Er, Et: radial and tangential energies, sums of u_r^2 and u_t^2
+            sum_ut: sum of the tangential displacements u_t
+            n_nodes: number of nodes
+        """
+        # Compact (float32) displacements are accumulated in float64
+        U = np.asarray(U, dtype=np.float64)
+        # Proportions only consider nodes with U2 >= 0; masking the squares in place saves a temporary of the size of U
+        sq = np.square(U)
+        sq *= (U[:, :, 1] >= 0)[:, :, None]
+        sumsq = sq.sum(axis=1)
+        resultant = np.sqrt(sq.sum(axis=2)).sum(axis=1)
+        del sq
+
+        # Radial and tangential components along r̂ and t̂ = n̂ × r̂ (n̂ = +Y)
+        u_r = np.einsum("mnk,nk->mn", U, r_hat)
+        u_t = np.einsum("mnk,nk->mn", U, t_hat)
+        return {
+            "sumsq": sumsq,
+            "resultant": resultant,
+            "Er": np.sum(u_r**2, axis=1),
+            "Et": np.sum(u_t**2, axis=1),
+            "sum_ut": np.sum(u_t, axis=1),
+            "n_nodes": np.full(len(U), U.shape[1], dtype=np.int64),
+        }
+
+    @staticmethod
+    def metrics_from_statistics(stats: dict[str, np.ndarray], has_centroid_node: bool) -> dict[str, np.ndarray]:
+        """
+        Computes the metrics of get_mode_metrics (other than freq) from the sums of sufficient_statistics.
+        """
+        sumsq = stats["sumsq"]
+        total_energy = sumsq.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            oop = sumsq[:, 1] / total_energy * 100
+            ip = (sumsq[:, 0] + sumsq[:, 2]) / total_energy * 100
+            tang_ratio = stats["Et"] / stats["Er"]
+            # Mean and RMS of u_t
+            mean_ut = stats["sum_ut"] / stats["n_nodes"]
+            rms = np.sqrt(stats["Et"] / stats["n_nodes"])
+            rho = np.where(rms == 0, 0.0, np.abs(mean_ut) / rms)
+        if has_centroid_node:
+            # A node on the centroid has no radial direction, which makes the energy ratio undefined
+            tang_ratio = np.full_like(tang_ratio, np.nan)
+
+        return {
+            "oop": oop,
+            "ip": ip,
+            "sumsq_x": sumsq[:, 0],
+            "sumsq_y": sumsq[:, 1],
+            "sumsq_z": sumsq[:, 2],
+            "resultant": stats["resultant"],
+            "tang_ratio": tang_ratio,
+            "rigid_rho": rho,
+        }
+
+    @classmethod
+    def compute_metrics(cls, U: np.ndarray, geometry) -> dict[str, np.ndarray]:
+        """
+        Computes the metrics of a stack of modes.
 
-        # local unit tangential vector t̂ = n̂ × r̂ (n̂ = +Y)
-        rx = df["x"] - ctr_x
-        rz = df["z"] - ctr_z
-        r_len = np.hypot(rx, rz)
-        t_hat_x = np.nan_to_num(rz / r_len)
-        t_hat_z = -np.nan_to_num(rx / r_len)
+        Parameters:
+        U (np.ndarray): (n_modes, N, 3) displacements [U1, U2, U3], axis 1 aligned with geometry.
+        geometry (NodeGeometry): Radial/tangential frame of the nodes.
 
-        # tangential component
-        u_t = df["U1"] * t_hat_x + df["U3"] * t_hat_z
+        Returns:
+        dict: {column: (n_modes,) array} for the columns of get_mode_metrics other than freq.
+        """
+        stats = cls.sufficient_statistics(U, geometry.r_hat, geometry.t_hat)
+        return cls.metrics_from_statistics(stats, geometry.has_centroid_node)
 
-        rms = np.sqrt(np.mean(u_t**2))
-        rho = 0.0 if rms == 0 else abs(np.mean(u_t)) / rms
+    def stream_metrics(self, n: int) -> dict[str, np.ndarray]:
+        """
+        Computes the metrics of one mode from its displacements read chunk_size nodes at a time
+        (ModalParser.iter_mode_chunks), summing the sufficient statistics of every chunk.
+        """
+        geometry = self.model.geometry
+        stats = None
+        for rows, U in self.model.iter_mode_chunks(n, self.chunk_size):
+            chunk_stats = self.sufficient_statistics(U[None], geometry.r_hat[rows], geometry.t_hat[rows])
+            stats = chunk_stats if stats is None else {key: stats[key] + chunk_stats[key] for key in stats}
+        if stats is None:
+            # A mode without nodes
+            stats = self.sufficient_statistics(np.empty((1, 0, 3)), geometry.r_hat[:0], geometry.t_hat[:0])
+        return self.metrics_from_statistics(stats, geometry.has_centroid_node)
+
+    def get_mode_metrics(self) -> pd.DataFrame:
+        """
+        Computes the metrics of every mode once; every classification method and results_table reads them
+        from this table. The "batched" engine parses the displacement array of the model at once and computes the metrics one mode
+        at a time from it, the "per_mode" engine reads and computes one mode at a time and the "streaming" engine
+        one chunk of nodes of one mode at a time.
 
-        flag = bool(rho > rigid_ratio_thres)
-        return (flag, float(rho)) if return_ratio else flag
+        Returns:
+        pd.DataFrame: Indexed by mode_no, with columns
+            freq: frequency of the mode (Hz)
+            oop, ip, sumsq_x, sumsq_y, sumsq_z, resultant: as returned by get_proportions
+            tang_ratio: tangential-to-radial energy ratio Et / Er
+            rigid_rho: rigid body rotation ratio
+        """
+        if self.mode_metrics is not None:
+            return self.mode_metrics
+
+        geometry = self.model.geometry
+        with stage("analyser.mode_metrics"):
+            if self.engine == "batched":
+                mode_numbers, U = self.model.get_displacements()
+                # One mode at a time, so the temporaries (and the float64 copy of compact models) are the size
+                # of one mode rather than of the whole displacement array
+                rows = [self.compute_metrics(U[i:i + 1], geometry) for i in range(len(U))]
+                metrics = {column: np.concatenate([row[column] for row in rows]) for column in rows[0]}
+            else:
+                mode_numbers = np.arange(1, self.max + 1)
+                if self.engine == "per_mode":
+                    rows = [self.compute_metrics(self.model.mode_displacements(n)[None], geometry) for n in mode_numbers]
+                else:
+                    rows = [self.stream_metrics(n) for n in mode_numbers]
+                metrics = {column: np.concatenate([row[column] for row in rows]) for column in rows[0]}
+
+        index = pd.Index(mode_numbers, name="mode_no")
+        self.mode_metrics = pd.DataFrame(
+            {"freq": self.mode_table["freq"].reindex(index).to_numpy(), **metrics},
+            index=index,
+        )
+        return self.mode_metrics
 
+    @profiled("analyser.inplane")
     def get_inplane(self) -> list[int]:
         """
         Get the list of in-plane mode numbers. This is achieved if modes achieve these criterias:
@@ -154,24 +313,14 @@ class ModalAnalyser:
         Returns:
         list[int]: The list of in-plane mode numbers.
         """
-        inplane_modes = []
-        xz = []
-
+        metrics = self.get_mode_metrics().loc[1 : self.max]
+        xz = metrics["sumsq_x"] + metrics["sumsq_z"]
         # Ensure is tangential and not rigid motion
-        for n in range(1, self.max + 1):
-            _, _, x, _, z, _ = self.get_proportions(n)
-            xz.append(x + z)
-            if self.is_tangential(n) and not self.is_rigid_rotation(n):
-                inplane_modes.append(n)
-
+        candidates = (metrics["tang_ratio"] > self.tang_ratio_thres) & ~(
+            metrics["rigid_rho"] > self.rigid_ratio_thres
+        )
         # Ensure all x+z are > 2 * mean(x+z)
-        xz_mean = np.mean(xz)
-        inplane_modes = [
-            mode
-            for mode in inplane_modes
-            if self.get_proportions(mode)[2] + self.get_proportions(mode)[4]
-            > 2 * xz_mean
-        ]
+        inplane_modes = metrics.index[candidates & (xz > 2 * xz.mean())].tolist()
 
         if self.inplane_modes:
             print("Overwriting previously calculated inplane modes...")
@@ -179,15 +328,13 @@ class ModalAnalyser:
 
         return inplane_modes
 
+    @profiled("analyser.outplane")
     def get_outplane(self) -> list[int]:
         """
         Gets all outplane modes in the specified range.
         """
-        outplane_modes = []
-        for mode in range(1, self.max + 1):
-            oop, _, _, _, _, _ = self.get_proportions(mode)
-            if oop > self.oop_thres:
-                outplane_modes.append(mode)
+        oop = self.get_mode_metrics().loc[1 : self.max, "oop"]
+        outplane_modes = oop.index[oop > self.oop_thres].tolist()
         self.outplane_modes = outplane_modes
         return outplane_modes
 
@@ -212,44 +359,58 @@ class ModalAnalyser:
         print("Results Table:")
         print(self.results)
 
-        if (
-            self.results["Lower Frequency Diff (Hz)"].min() < self.near_inplane_thres
-            or self.results["Upper Frequency Diff (Hz)"].min() < self.near_inplane_thres
-        ):
+        self.min_separation = self.get_min_separation()
+        print("Minimum separation (Hz):", self.min_separation)
+
+        if self.min_separation < self.near_inplane_thres:
             print("Warning: Some out-of-plane modes are near in-plane modes.")
             return False
         return True
 
+    @profiled("analyser.results_table")
     def results_table(self) -> 'html': #type:ignore
-        inplane_outplane_tuple = []
-
-        for inplane_mode in self.inplane_modes:
-            # Find nearest out-of-plane modes to the left and right
-            left = max(
-                [m for m in self.outplane_modes if m < inplane_mode], default=None
-            )
-            right = min(
-                [m for m in self.outplane_modes if m > inplane_mode], default=None
-            )
-
-            left_freq = self.get_freq(left) if left is not None else None
-            inplane_freq = self.get_freq(inplane_mode)
-            right_freq = self.get_freq(right) if right is not None else None
-            left_diff = np.nan if left_freq is None else inplane_freq - left_freq
-            right_diff = np.nan if right_freq is None else right_freq - inplane_freq
-
-            inplane_outplane_tuple.append(
-                (left_diff, left_freq, inplane_freq, right_freq, right_diff)
-            )
+        """
+        Finds the nearest out-of-plane modes below and above every in-plane mode and their frequency gaps.
+
+        Returns:
+        pd.DataFrame: One row per in-plane mode, NaN where there is no out-of-plane mode on that side.
+        """
+        # Frequencies come from the metrics table, like every other per-mode quantity
+        freq = self.get_mode_metrics()["freq"]
+        inplane = np.asarray(self.inplane_modes, dtype=np.int64)
+        outplane = np.sort(np.asarray(self.outplane_modes, dtype=np.int64))
+
+        # Nearest out-of-plane mode numbers to the left and right of every in-plane mode
+        right_pos = np.searchsorted(outplane, inplane, side="right")
+        left_pos = np.searchsorted(outplane, inplane, side="left") - 1
+
+        # A trailing NaN stands for the missing neighbour at either end (position -1 or len(outplane))
+        outplane_freq = np.append(freq.reindex(outplane).to_numpy(dtype=float), np.nan)
+        inplane_freq = freq.reindex(inplane).to_numpy(dtype=float)
+        left_freq = outplane_freq[left_pos]
+        right_freq = outplane_freq[right_pos]
 
         df = pd.DataFrame(
-            inplane_outplane_tuple,
-            columns=[
-                "Lower Frequency Diff (Hz)",
-                "Lower Out-of-plane (Hz)",
-                "In-plane (Hz)",
-                "Right Out-of-plane (Hz)",
-                "Upper Frequency Diff (Hz)",
-            ],
+            {
+                "Lower Frequency Diff (Hz)": inplane_freq - left_freq,
+                "Lower Out-of-plane (Hz)": left_freq,
+                "In-plane (Hz)": inplane_freq,
+                "Right Out-of-plane (Hz)": right_freq,
+                "Upper Frequency Diff (Hz)": right_freq - inplane_freq,
+            }
         )
         return df
+
+    def get_min_separation(self) -> float:
+        """
+        Gets the smallest frequency gap between an in-plane mode and its nearest out-of-plane modes.
+
+        Returns:
+        float: The minimum separation (Hz), NaN if no in-plane mode has an out-of-plane neighbour.
+        """
+        if self.results is None:
+            self.results = self.results_table()
+        gaps = self.results[["Lower Frequency Diff (Hz)", "Upper Frequency Diff (Hz)"]].to_numpy(dtype=float)
+        if not np.isfinite(gaps).any():
+            return np.nan
+        return float(np.nanmin(gaps))
@@ -0,0 +1,136 @@
+KEYWORD = b"E I G E N V A L U E    N U M B E R"
+HEADER = b"U3"
+FOOTER = b"MAX"
+
+
+class DATIndexer:
+    """
+    DATIndexer builds the eigenvector table index of a .dat file (DATParser.mode_index) from its bytes as they
+    arrive, e.g. while an upload is copied to disk, so the file does not need to be scanned again once complete.
+    It applies the same rules as DATParser.build_mode_index and only holds the bytes of the current chunk,
+    plus a few bytes of keywords that may straddle chunks.
+    Attributes:
+        mode_index (dict[int, tuple[int, int]]): Byte offsets (start, end) of the numeric eigenvector block of
+            every mode found so far. Complete once close() returns.
+        size (int): Number of bytes fed so far.
+    Methods:
+        feed(chunk): Scans the next bytes of the file.
+        close(): Checks that the file did not end inside a table and returns mode_index.
+    """
+    def __init__(self):
+        self.mode_index = {}
+        self.size = 0
+        self._buffer = b""
+        self._offset = 0 # file offset of self._buffer[0]
+        self._pos = 0 # position in self._buffer where the scan resumes
+        self._state = "keyword"
+        self._newline = None
+        self._last_byte = b""
+        self._mode_number = None
+        self._table_start = None # file offset of the current table
+        self._data_end = None # file offset after the last non-blank byte of the current table already dropped
+
+    def _delim(self) -> bytes:
+        return b"\n  \n".replace(b"\n", self._newline)
+
+    def feed(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        if self._newline is None:
+            # Match the file's own line endings, as DATParser does in mmap mode
+            first_newline = chunk.find(b"\n")
+            if first_newline != -1:
+                previous = chunk[first_newline - 1:first_newline] if first_newline > 0 else self._last_byte
+                self._newline = b"\r\n" if previous == b"\r" else b"\n"
+        self._last_byte = chunk[-1:]
+        self.size += len(chunk)
+
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._offset += self._pos
+        self._pos = 0
+        while self._step():
+            pass
+        self._drop_scanned()
+
+    def _drop_scanned(self) -> None:
+        """
+        Drops the bytes before the scan position, remembering where the current table's data ends in them.
+        """
+        if self._state == "table":
+            table_start = max(self._table_start - self._offset, 0)
+            data = self._buffer[table_start:self._pos].rstrip()
+            if data:
+                self._data_end = self._offset + table_start + len(data)
+        self._offset += self._pos
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+
+    def _step(self) -> bool:
+        """
+        Advances the scan by one token. Returns False when more bytes are needed.
+        """
+        buffer = self._buffer
+        if self._state == "keyword":
+            index = buffer.find(KEYWORD, self._pos)
+            if index == -1:
+                self._pos = max(self._pos, len(buffer) - len(KEYWORD) + 1)
+                return False
+            self._pos = index + len(KEYWORD)
+            self._state = "number"
+
+        elif self._state == "number":
+            if len(buffer) < self._pos + 6:
+                return False
+            self._mode_number = int(buffer[self._pos:self._pos + 6])
+            self._pos += 6
+            self._state = "header"
+
+        elif self._state == "header":
+            index = buffer.find(HEADER, self._pos)
+            if index == -1:
+                self._pos = max(self._pos, len(buffer) - len(HEADER) + 1)
+                return False
+            self._pos = index + len(HEADER)
+            self._state = "delim"
+
+        elif self._state == "delim":
+            if self._newline is None:
+                return False
+            delim = self._delim()
+            index = buffer.find(delim, self._pos)
+            if index == -1:
+                self._pos = max(self._pos, len(buffer) - len(delim) + 1)
+                return False
+            self._pos = index + len(delim)
+            self._table_start = self._offset + self._pos
+            self._data_end = None
+            self._state = "table"
+
+        elif self._state == "table":
+            # The table is cut at the MAX footer, which must come before the next delimiter
+            delim = self._delim()
+            max_index = buffer.find(FOOTER, self._pos)
+            delim_index = buffer.find(delim, self._pos)
+            if delim_index != -1 and (max_index == -1 or max_index + len(FOOTER) > delim_index):
+                raise Exception("Incorrect file format")
+            if max_index == -1:
+                self._pos = max(self._pos, len(buffer) - max(len(delim), len(FOOTER)) + 1)
+                return False
+
+            table_start = max(self._table_start - self._offset, 0)
+            data = buffer[table_start:max_index].rstrip()
+            if data:
+                table_end = self._offset + table_start + len(data)
+            else:
+                table_end = self._data_end if self._data_end is not None else self._table_start
+
+            # Keep the first occurrence, as DATParser.build_mode_index does
+            self.mode_index.setdefault(self._mode_number, (self._table_start, table_end))
+            self._pos = max_index
+            self._state = "keyword"
+        return True
+
+    def close(self) -> dict[int, tuple[int, int]]:
+        if self._state != "keyword":
+            raise Exception("Incorrect file format")
+        return self.mode_index
@@ -1,39 +1,141 @@
-from io import StringIO
+from io import BytesIO, StringIO
+import mmap
+from typing import Iterator
 import pandas as pd
 import numpy as np
 
+from core.parser.tableParser import parse_table
+from core.profiling import profiled, stage
+
+PARSER_ENGINES = ("numpy", "pandas")
+DTYPES = ("float64", "float32")
+
+
+def compact_ids(ids: np.ndarray) -> np.ndarray:
+    """
+    Returns integer ids as int32 if they all fit, else unchanged.
+    """
+    info = np.iinfo(np.int32)
+    if len(ids) and (ids.min() < info.min or ids.max() > info.max):
+        return ids
+    return ids.astype(np.int32)
+
+
 class DATParser:
     """
     DATParser is a class for parsing .dat files generated from modal analysis outputs.
     It provides methods to extract mode tables and mode-specific displacement data
     from the file contents.
+    Construction only reads the head of the file, up to the eigenvalue table, so frequency-only workflows do not
+    depend on the file size. The whole file is read (or mapped) and indexed when eigenvector tables are first needed.
     Attributes:
         dat_file (str): Path to the .dat file to be parsed.
-        contents (str): Contents of the .dat file.
+        parser_engine (str): "numpy" decodes eigenvector tables with core.parser.tableParser,
+            "pandas" goes through pd.read_csv.
+        use_mmap (bool): If True, the file is memory-mapped and searched as bytes instead of being read into a str.
+        dtype (str): Storage type of the displacement array of get_displacements, "float64" or "float32".
+            With "float32", its node numbers are int32 where they fit.
+        contents (str or None): Contents of the .dat file, read on first access. None when use_mmap is True.
         mode_table_df (pd.DataFrame): DataFrame ['mode_no', 'freq']
+        mode_index (dict[int, tuple[int, int]]): Offsets (start, end) of the numeric eigenvector block of every mode,
+            built on first access
     Methods:
-        __init__(dat_file: str):
+        __init__(dat_file: str, parser_engine: str = "numpy", use_mmap: bool = False, mode_index: dict | None = None, dtype: str = "float64"):
             Initializes the DATParser with the given .dat file path, reads the file,
-            and extracts the mode table DataFrame.
+            and extracts the mode table DataFrame. A mode_index built while the file was written
+            (core.parser.datIndexer.DATIndexer) can be passed with use_mmap=True to skip the index scan.
         _read_file() -> str:
             Reads the contents of the .dat file if it has a .dat extension.
             Raises an error if the file cannot be read or does not have the correct extension.
-        extract_str(contents: str, keyword: str, delim: str ='\n\n\n') -> str:
+        _map_file() -> mmap.mmap:
+            Memory-maps the .dat file read-only, with the same checks as _read_file.
+        _read_head(keyword: str, delim: str = '\n\n\n') -> str:
+            Reads the file from its start until the table after keyword is complete.
+        extract_str(contents: str | bytes, keyword: str | bytes, delim: str | bytes ='\n\n\n') -> str | bytes:
             Extracts a substring from the contents, starting after the given keyword,
             and bounded by the specified delimiter. Used to isolate table data.
+        build_mode_index() -> dict[int, tuple[int, int]]:
+            Scans the file contents once and records where the eigenvector table of each mode starts and ends.
         get_mode_table_df() -> pd.DataFrame:
             Extracts the mode table from the file contents, returning a DataFrame
             with columns for mode number and frequency.
         get_mode_df(mode_number: int) -> pd.DataFrame:
             Extracts the displacement table for a specific mode number, returning a DataFrame
             with columns for node number and displacement components (U1, U2, U3) -> ['mode_no', 'U1', 'U2', 'U3']
+        get_mode_array(mode_number: int) -> np.ndarray:
+            Same table as get_mode_df as a (n_nodes, 4) float64 array, without building a DataFrame.
+        iter_mode_array(mode_number: int, chunk_rows: int) -> Iterator[tuple[int, np.ndarray]]:
+            Same table as get_mode_array, parsed and yielded about chunk_rows rows at a time.
+        get_node_numbers() -> np.ndarray:
+            Returns the node numbers listed by the eigenvector tables, in row order.
+        get_displacements() -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+            Parses every eigenvector table once, returning the mode numbers, the shared node numbers and
+            a (n_modes, n_nodes, 3) array of displacements (U1, U2, U3).
+        iter_displacements(chunk_rows: int) -> Iterator[tuple[int, int, np.ndarray]]:
+            Same displacements as get_displacements, parsed and yielded about chunk_rows rows of a mode at a time.
+        get_max_disp_per_mode() -> pd.DataFrame:
+            Returns the maximum resultant displacement of every mode, parsing one mode at a time -> ['mode_no', 'max_disp']
+        get_max_disp() -> float:
+            Returns the maximum resultant displacement over all modes.
+        close():
+            Releases the memory map when use_mmap is True.
     """
 
-    def __init__(self, dat_file: str):
+    def __init__(
+        self,
+        dat_file: str,
+        parser_engine: str = "numpy",
+        use_mmap: bool = False,
+        mode_index: dict[int, tuple[int, int]] | None = None,
+        dtype: str = "float64",
+    ):
+        if parser_engine not in PARSER_ENGINES:
+            raise ValueError(f"parser_engine must be one of {PARSER_ENGINES}. Provided: {parser_engine}")
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {DTYPES}. Provided: {dtype}")
+        if mode_index is not None and not use_mmap:
+            raise ValueError("A prebuilt mode_index holds byte offsets and requires use_mmap=True.")
         self.dat_file = dat_file
-        self.contents = self._read_file()
+        self.parser_engine = parser_engine
+        self.use_mmap = use_mmap
+        self.dtype = dtype
+        # The file is only read (or mapped) and indexed when eigenvector tables are first needed
+        self._contents = None
+        self._map = None
+        self._newline = None
+        self._mode_index = None if mode_index is None else dict(mode_index)
+        self._displacements = None
         self.mode_table_df = self.get_mode_table_df()
 
+    @property
+    def contents(self) -> str | None:
+        if self.use_mmap:
+            return None
+        if self._contents is None:
+            self._contents = self._read_file()
+        return self._contents
+
+    @property
+    def _source(self) -> str | mmap.mmap:
+        if not self.use_mmap:
+            return self.contents
+        if self._map is None:
+            self._map = self._map_file()
+            # Text mode translates line endings, bytes keep them, so match the file's own
+            first_newline = self._map.find(b'\n')
+            self._newline = b'\r\n' if first_newline > 0 and self._map[first_newline - 1] == ord('\r') else b'\n'
+        return self._map
+
+    @property
+    def mode_index(self) -> dict[int, tuple[int, int]]:
+        if self._mode_index is None:
+            self._mode_index = self.build_mode_index()
+            if self.use_mmap and hasattr(mmap, 'MADV_DONTNEED'):
+                # Drop the pages touched by the index scan; tables are paged back in when extracted
+                self._source.madvise(mmap.MADV_DONTNEED)
+        return self._mode_index
+
+    @profiled("dat.read")
     def _read_file(self) -> str:
         if self.dat_file.endswith(".dat"):
             try:
@@ -44,40 +146,91 @@ class DATParser:
         else:
             raise ValueError(f"File {self.dat_file} does not have a .dat extension")
 
+    @profiled("dat.map")
+    def _map_file(self) -> mmap.mmap:
+        if self.dat_file.endswith(".dat"):
+            try:
+                with open(self.dat_file, "rb") as file:
+                    return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except Exception as e:
+                raise RuntimeError(f"Error reading file {self.dat_file}: {e}")
+        else:
+            raise ValueError(f"File {self.dat_file} does not have a .dat extension")
+
+    @profiled("dat.read_head")
+    def _read_head(self, keyword: str, delim: str = '\n\n\n', block_size: int = 1 << 16) -> str:
+        """
+        Reads the file from its start until the table after keyword (as extracted by extract_str) is complete,
+        so tables near the top of the file are found without reading the rest. Returns the whole contents if they
+        were already read, and everything read otherwise (the whole file if the table is not complete).
+        """
+        if self._contents is not None:
+            return self._contents
+        if not self.dat_file.endswith(".dat"):
+            raise ValueError(f"File {self.dat_file} does not have a .dat extension")
+        head = ""
+        keyword_index = -1
+        try:
+            with open(self.dat_file, "r") as file:
+                while block := file.read(block_size):
+                    search_from = max(len(head) - len(keyword), 0)
+                    head += block
+                    # Blocks grow, so the head is copied a bounded number of times however far the table is
+                    block_size *= 2
+                    if keyword_index == -1:
+                        keyword_index = head.find(keyword, search_from)
+                    if keyword_index != -1:
+                        table_start = head.find(delim, keyword_index + len(keyword))
+                        if table_start != -1 and head.find(delim, table_start + len(delim)) != -1:
+                            break
+        except Exception as e:
+            raise RuntimeError(f"Error reading file {self.dat_file}: {e}")
+        return head
+
+    def close(self) -> None:
+        if self._map is not None and not self._map.closed:
+            self._map.close()
+
+    def _token(self, text: str) -> str | bytes:
+        """
+        Returns a keyword or delimiter in the form the file contents are searched in.
+        """
+        if not self.use_mmap:
+            return text
+        if self._newline is None:
+            self._source # maps the file and detects its line endings
+        return text.encode().replace(b'\n', self._newline)
+
     @staticmethod
-    def extract_str(contents: str, keyword: str, delim: str ='\n\n\n') -> str:
+    def extract_str(contents: str | bytes, keyword: str | bytes, delim: str | bytes ='\n\n\n') -> str | bytes:
         """
-        Extracts strings consisting of only table values specific for .dat files
+        Extracts strings consisting of only table values specific for .dat files.
+        contents may be a str, bytes or mmap, with keyword and delim of the matching type.
         """
+        name = keyword if isinstance(keyword, str) else keyword.decode()
         start_index = contents.find(keyword)
         if start_index == -1:
-            raise ValueError(f"Keyword '{keyword}' not found in file.")
+            raise ValueError(f"Keyword '{name}' not found in file.")
         start_index += len(keyword)
-        remaining_text = contents[start_index:]
-        search_start = 0
-        count = 0
-        while count != 2:
-            pos = remaining_text.find(delim, search_start)
-            if pos == -1:
-                break
-            if count == 0:
-                table_start_index = pos + len(delim)
-            elif count == 1:
-                table_end_index = pos
-            count += 1
-            search_start = pos + len(delim)
-        try:
-            table_str = remaining_text[table_start_index:table_end_index]
-        except:
-            table_str = remaining_text[table_start_index:]
-        return table_str
 
+        # The table lies between the first and second delimiter after the keyword
+        table_start_index = contents.find(delim, start_index)
+        if table_start_index == -1:
+            raise ValueError(f"No table found after keyword '{name}'.")
+        table_start_index += len(delim)
+        table_end_index = contents.find(delim, table_start_index)
+        if table_end_index == -1:
+            table_end_index = len(contents)
+        return contents[table_start_index:table_end_index]
+
+    @profiled("dat.eigenvalue_table")
     def get_mode_table_df(self) -> pd.DataFrame:
         """
         Extracts table [mode_no, freq] from extracted string
         """
         keyword = 'E I G E N V A L U E    O U T P U T'
-        table = self.extract_str(self.contents, keyword)
+        # The eigenvalue table precedes the eigenvector tables, so only the head of the file is read
+        table = self.extract_str(self._read_head(keyword), keyword, '\n\n\n')
         mode_table_df = pd.read_csv(
             StringIO(table),
             sep=r'\s+',
@@ -95,21 +248,66 @@ class DATParser:
         mode_table_df.rename(columns = {'freq (cycles/time)': 'freq'}, inplace=True)
         return mode_table_df
 
+    @profiled("dat.mode_index")
+    def build_mode_index(self) -> dict[int, tuple[int, int]]:
+        """
+        Builds {mode_no: (start, end)} offsets of every eigenvector table in one forward scan,
+        where contents[start:end] holds only the numeric rows of the table.
+        """
+        contents = self._source
+        keyword = self._token("E I G E N V A L U E    N U M B E R")
+        header = self._token("U3")
+        delim = self._token("\n  \n")
+        footer = self._token("MAX")
+        mode_index = {}
+        pos = contents.find(keyword)
+        while pos != -1:
+            num_start = pos + len(keyword)
+            mode_number = int(contents[num_start:num_start + 6])
+
+            header_index = contents.find(header, num_start + 6)
+            if header_index == -1:
+                raise Exception("Incorrect file format")
+            table_start = contents.find(delim, header_index + len(header))
+            if table_start == -1:
+                raise Exception("Incorrect file format")
+            table_start += len(delim)
+
+            # The table is cut at the MAX footer, which must come before the next delimiter
+            table_bound = contents.find(delim, table_start)
+            if table_bound == -1:
+                table_bound = len(contents)
+            max_index = contents.find(footer, table_start, table_bound)
+            if max_index == -1:
+                raise Exception("Incorrect file format")
+            table_end = max_index
+            while table_end > table_start and contents[table_end - 1:table_end].isspace():
+                table_end -= 1
+
+            # Keep the first occurrence, as a full-text find() would
+            mode_index.setdefault(mode_number, (table_start, table_end))
+            pos = contents.find(keyword, max_index)
+        return mode_index
+
+    def _get_mode_table_str(self, mode_number: int) -> str | bytes:
+        if mode_number not in self.mode_index:
+            raise ValueError(f"Mode number {mode_number} not found.")
+        start, end = self.mode_index[mode_number]
+        return self._source[start:end]
+
     def get_mode_df(self, mode_number: int) -> pd.DataFrame:
         """
         Exctracts table [node_no, x, y, z] from extracted string
         """
-        num_str = str(mode_number)
-        keyword = f"E I G E N V A L U E    N U M B E R{num_str.rjust(6, ' ')}"
-        table_content_start = self.contents.find(keyword)
-        table_content = self.contents[table_content_start + len(keyword):]
-        table = DATParser.extract_str(table_content, 'U3', delim='\n  \n')
-        max_index = table.find('MAX') 
-        if max_index == -1:
-            raise Exception("Incorrect file format")
-        table = table[:max_index].rstrip()
+        if self.parser_engine == "numpy":
+            table = self.get_mode_array(mode_number)
+            mode_df = pd.DataFrame(table[:, 1:], columns=['U1', 'U2', 'U3'])
+            mode_df.insert(0, 'node_no', table[:, 0].astype(np.int64))
+            return mode_df
+
+        table = self._get_mode_table_str(mode_number)
         mode_df = pd.read_csv(
-            StringIO(table),
+            BytesIO(table) if self.use_mmap else StringIO(table),
             sep=r'\s+',
             header=None,
             names=[
@@ -121,6 +319,115 @@ class DATParser:
         )
         return mode_df
 
+    @profiled("dat.parse_table")
+    def get_mode_array(self, mode_number: int) -> np.ndarray:
+        """
+        Extracts table [node_no, U1, U2, U3] of a mode as a (n_nodes, 4) float64 array
+        """
+        if self.parser_engine == "numpy":
+            return parse_table(self._get_mode_table_str(mode_number), 4)
+        return self.get_mode_df(mode_number).to_numpy(dtype=np.float64)
+
+    def _parse_rows(self, rows: str | bytes) -> np.ndarray:
+        if self.parser_engine == "numpy":
+            return parse_table(rows, 4)
+        return pd.read_csv(
+            BytesIO(rows) if self.use_mmap else StringIO(rows), sep=r'\s+', header=None
+        ).to_numpy(dtype=np.float64)
+
+    def iter_mode_array(self, mode_number: int, chunk_rows: int = 100000) -> Iterator[tuple[int, np.ndarray]]:
+        """
+        Parses table [node_no, U1, U2, U3] of a mode in chunks of about chunk_rows rows, cut at line ends,
+        so only one chunk is held in memory at a time. With use_mmap, the pages of every chunk are released once parsed.
+
+        Returns:
+        Iterator: (row_offset, table) pairs, table being the (n_rows, 4) float64 rows starting at row row_offset
+        """
+        if mode_number not in self.mode_index:
+            raise ValueError(f"Mode number {mode_number} not found.")
+        if chunk_rows < 1:
+            raise ValueError(f"chunk_rows must be at least 1. Provided: {chunk_rows}")
+        start, end = self.mode_index[mode_number]
+        newline = self._token('\n')
+        row_offset = 0
+        pos = start
+        while pos < end:
+            # Rows are (nearly) fixed-width, so the first row's length sizes the chunk
+            line_end = self._source.find(newline, pos, end)
+            line_len = end - pos if line_end == -1 else line_end + 1 - pos
+            stop = self._source.find(newline, min(pos + line_len * chunk_rows, end) - 1, end)
+            stop = end if stop == -1 else stop + 1
+            with stage("dat.parse_table"):
+                table = self._parse_rows(self._source[pos:stop])
+            self._release(pos, stop)
+            yield row_offset, table
+            row_offset += len(table)
+            pos = stop
+
+    def get_node_numbers(self) -> np.ndarray:
+        """
+        Returns the node numbers of the eigenvector tables in row order. They are read from the first table only,
+        since every mode lists the same nodes, one chunk at a time.
+        """
+        if self._displacements is not None:
+            return self._displacements[1]
+        if not self.mode_index:
+            return np.empty(0, dtype=np.int64)
+        chunks = [table[:, 0].astype(np.int64) for _, table in self.iter_mode_array(min(self.mode_index))]
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
+
+    def get_displacements(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Parses all eigenvector tables into one array. Every mode must list the same nodes in the same order.
+
+        Returns:
+        tuple: (mode_numbers, node_numbers, displacements)
+            mode_numbers: (n_modes,) sorted mode numbers, mode_numbers[i] is displacements[i]
+            node_numbers: (n_nodes,) node numbers in .dat row order, shared by all modes
+            displacements: (n_modes, n_nodes, 3) array of [U1, U2, U3], of type dtype
+        """
+        if self._displacements is not None:
+            return self._displacements
+
+        mode_numbers = np.array(sorted(self.mode_index), dtype=np.int64)
+        node_numbers = None
+        displacements = None
+        for i, mode_number in enumerate(mode_numbers):
+            table = self.get_mode_array(mode_number)
+            if node_numbers is None:
+                node_numbers = compact_ids(table[:, 0].astype(np.int64)) if self.dtype == "float32" else table[:, 0].astype(np.int64)
+                displacements = np.empty((len(mode_numbers), len(node_numbers), 3), dtype=self.dtype)
+            elif len(table) != len(node_numbers) or not np.array_equal(table[:, 0], node_numbers):
+                raise ValueError(f"Mode number {mode_number} does not list the same nodes as mode {mode_numbers[0]}.")
+            displacements[i] = table[:, 1:]
+
+        if node_numbers is None:
+            node_numbers = np.empty(0, dtype=np.int64)
+            displacements = np.empty((0, 0, 3), dtype=self.dtype)
+
+        self._displacements = (mode_numbers, node_numbers, displacements)
+        return self._displacements
+
+    def iter_displacements(self, chunk_rows: int = 100000) -> Iterator[tuple[int, int, np.ndarray]]:
+        """
+        Parses all eigenvector tables about chunk_rows rows at a time (see iter_mode_array), so they can be written
+        out without holding every mode in memory. Every mode must list the nodes of get_node_numbers() in the same order.
+
+        Returns:
+        Iterator: (i, row_offset, U) triples, U being the (n_rows, 3) [U1, U2, U3] rows of mode sorted(mode_index)[i]
+            starting at row row_offset
+        """
+        node_numbers = self.get_node_numbers()
+        for i, mode_number in enumerate(sorted(self.mode_index)):
+            n_rows = 0
+            for row_offset, table in self.iter_mode_array(mode_number, chunk_rows):
+                n_rows = row_offset + len(table)
+                if n_rows > len(node_numbers) or not np.array_equal(table[:, 0], node_numbers[row_offset:n_rows]):
+                    raise ValueError(f"Mode number {mode_number} does not list the same nodes as mode {min(self.mode_index)}.")
+                yield i, row_offset, table[:, 1:]
+            if n_rows != len(node_numbers):
+                raise ValueError(f"Mode number {mode_number} does not list the same nodes as mode {min(self.mode_index)}.")
+
     def get_freq(self, mode_number: int) -> float:
         """
         Extracts the frequency for a specific mode number.
@@ -131,15 +438,36 @@ class DATParser:
         else:
             raise ValueError(f"Mode number {mode_number} not found.")
         
-    def get_max_disp(self) -> int:
+    def _release(self, start: int, end: int) -> None:
         """
-        Extracts the maximum displacement for all modes.
+        Drops the pages of contents[start:end] from memory when use_mmap is True.
+        """
+        if self.use_mmap and hasattr(mmap, 'MADV_DONTNEED'):
+            start -= start % mmap.PAGESIZE
+            self._source.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+    def get_max_disp_per_mode(self) -> pd.DataFrame:
         """
-        max_disp = 0
-        for mode_number in self.mode_table_df['mode_no']:
-            mode_df = self.get_mode_df(mode_number)
-            if not mode_df.empty:
-                resultant = np.sqrt(mode_df['U1']**2 + mode_df['U2']**2 + mode_df['U3']**2)
-                max_disp = max(max_disp, resultant.max())
+        Returns the maximum resultant displacement sqrt(U1^2 + U2^2 + U3^2) of every mode -> ['mode_no', 'max_disp'].
+        Modes are parsed one at a time and not kept, so memory stays bounded by one eigenvector table.
+        """
+        mode_numbers = np.array(sorted(self.mode_index), dtype=np.int64)
+        max_disp = np.zeros(len(mode_numbers), dtype=np.float64)
+        for i, mode_number in enumerate(mode_numbers):
+            if self._displacements is not None:
+                U = self._displacements[2][i]
+            else:
+                U = self.get_mode_array(mode_number)[:, 1:]
+                self._release(*self.mode_index[mode_number])
+            if len(U):
+                max_disp[i] = np.sqrt(np.sum(U**2, axis=1).max())
+        return pd.DataFrame({'mode_no': mode_numbers, 'max_disp': max_disp})
 
-        return max_disp
\ No newline at end of file
+    def get_max_disp(self) -> float:
+        """
+        Extracts the maximum displacement for all modes.
+        """
+        max_disp = self.get_max_disp_per_mode()['max_disp']
+        if max_disp.empty:
+            return 0
+        return max_disp.max().item()
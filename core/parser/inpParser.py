@@ -1,45 +1,151 @@
-from io import StringIO
+from io import BytesIO
+import mmap
+import os
+import numpy as np
 import pandas as pd
-import re
+
+from core.parser.tableParser import parse_table
+from core.profiling import profiled
 
 class INPParser:
     """
-    INPParser is a utility class for parsing Abaqus .inp files to extract node information.
+    INPParser is a utility class for parsing Abaqus .inp files to extract node and material information.
     This class provides methods to:
-    - Read the contents of an Abaqus .inp file.
-    - Extract the node table section from the file based on specific keywords.
-    - Convert the extracted node table string into a pandas DataFrame with columns for node number and coordinates (x, y, z).
+    - Read the contents of an Abaqus .inp file and of the files it includes (*INCLUDE, *NODE, INPUT=...).
+    - Index every keyword block of the file in a single scan (index_keywords).
+    - Convert the *NODE blocks into a pandas DataFrame with columns for node number and coordinates (x, y, z).
+    - Read the density and isotropic elastic constants of every *MATERIAL.
+    Keywords and option names are matched case-insensitively.
     Attributes:
         inp_file (str): Path to the .inp file to be parsed.
-        contents (str): The full contents of the .inp file as a string.
+        use_mmap (bool): If True, the files are memory-mapped and searched as bytes, and the maps are released once parsed.
+        contents (str or None): The full contents of the .inp file as a string. None when use_mmap is True.
+        keywords (list): (file, keyword, options, start, end) of every keyword block, included files spliced in
+            where they are included. start/end are the offsets of the data lines in file (bytes when use_mmap is True).
         node_df (pd.DataFrame): DataFrame ['node_no', 'x', 'y', 'z']
+        materials (dict): {name: {'density', 'elastic_modulus', 'poisson_ratio'}} of every *MATERIAL, None where not defined
+        element_sets (dict): {name: [(file, start, end), ...]} data line offsets of every *ELSET and *ELEMENT, ELSET= block
+        density (float): Density of the first material that defines one.
+        elastic_modulus (float): Isotropic elastic modulus of the first material that defines one.
     Methods:
-        _read_file(): Reads the .inp file and returns its contents as a string.
-        extract_str(inp_contents, start_keyword, end_keyword): Extracts a substring between two keywords from the file contents.
-        str_to_df(contents): Converts the extracted node table string into a pandas DataFrame -> ['node_no', 'x', 'y', 'z']
+        _read_file(path): Reads the .inp file (or an included file) and returns its contents as a string.
+        _map_file(path): Memory-maps the .inp file (or an included file) read-only.
+        extract_str(inp_contents, start_keyword, end_keyword): Extracts a substring between two keywords from the file contents (str, bytes or mmap).
+        index_keywords(contents): Returns (keyword, options, start, end) of every keyword block of the contents.
+        included_files(inp_file): Returns the paths of every file read through *INCLUDE or INPUT= options.
+        parse_node_block(block): Converts the data lines of one *NODE block into a (n_nodes, 4) array.
+        str_to_df(contents): Converts all *NODE blocks of the contents into a pandas DataFrame -> ['node_no', 'x', 'y', 'z']
+        get_density(material): Returns the density of a material.
+        get_elastic_modulus(material): Returns the isotropic elastic modulus of a material.
     """
-    def __init__(self, inp_file: str):
+    def __init__(self, inp_file: str, use_mmap: bool = False):
         self.inp_file = inp_file
-        self.contents = self._read_file()
-        self.node_df = self.str_to_df(self.contents)
-        self.density = self.get_density(self.contents)
-        self.elastic_modulus = self.get_elastic_modulus(self.contents)
+        self.use_mmap = use_mmap
+        self.contents = None if use_mmap else self._read_file()
 
-    def _read_file(self) -> str:
-        if self.inp_file.endswith(".inp"):
-            try:
-                with open(self.inp_file, "r") as file:
-                    return file.read()
-            except Exception as e:
-                raise RuntimeError(f"Error reading file {self.inp_file}: {e}")
-        else:
-            raise ValueError(f"File {self.inp_file} does not have a .inp extension")
+        maps = []
+        try:
+            contents = self._map_file() if use_mmap else self.contents
+            if use_mmap:
+                maps.append(contents)
+            blocks = self._index_file(inp_file, contents, maps, (os.path.abspath(inp_file),))
+            self._parse(blocks)
+        finally:
+            for file_map in maps:
+                file_map.close()
+
+        self.density = self.get_density()
+        self.elastic_modulus = self.get_elastic_modulus()
+
+    def _open(self, path: str, maps: list) -> str | mmap.mmap:
+        if not self.use_mmap:
+            return self._read_file(path)
+        file_map = self._map_file(path)
+        maps.append(file_map)
+        return file_map
+
+    def _index_file(self, path: str, contents: str | mmap.mmap, maps: list, stack: tuple[str, ...]) -> list[tuple]:
+        """
+        Returns (contents, file, keyword, options, start, end) of every keyword block of a file, with the
+        blocks of included files in place of their *INCLUDE.
+        """
+        blocks = []
+        for keyword, options, start, end in self.index_keywords(contents):
+            blocks.append((contents, path, keyword, options, start, end))
+            input_path = self._input_path(path, keyword, options)
+            if input_path is None:
+                continue
+            if os.path.abspath(input_path) in stack:
+                raise ValueError(f"File {input_path} includes itself (through {path})")
+
+            input_contents = self._open(input_path, maps)
+            if keyword == "INCLUDE":
+                blocks.extend(self._index_file(input_path, input_contents, maps, stack + (os.path.abspath(input_path),)))
+            else:
+                # *NODE, INPUT=...: the whole file holds the data lines of the block
+                blocks[-1] = (input_contents, input_path, keyword, options, 0, len(input_contents))
+        return blocks
+
+    def _parse(self, blocks: list[tuple]) -> None:
+        self.keywords = [block[1:] for block in blocks]
+
+        node_blocks = []
+        self.materials = {}
+        self.element_sets = {}
+        material = None
+        for contents, path, keyword, options, start, end in blocks:
+            if keyword == "NODE":
+                node_blocks.append(self.parse_node_block(contents[start:end]))
+            elif keyword == "MATERIAL":
+                material = options.get("NAME")
+                self._material(material)
+            elif keyword == "DENSITY":
+                self._material(material)["density"] = self._data_values(contents[start:end], "density")[0]
+            elif keyword == "ELASTIC" and options.get("TYPE", "ISOTROPIC").upper() == "ISOTROPIC":
+                values = self._data_values(contents[start:end], "elastic modulus")
+                self._material(material)["elastic_modulus"] = values[0]
+                self._material(material)["poisson_ratio"] = values[1] if len(values) > 1 else None
+            if keyword in ("ELSET", "ELEMENT") and "ELSET" in options:
+                self.element_sets.setdefault(options["ELSET"], []).append((path, start, end))
+
+        self.node_df = self.nodes_to_df(node_blocks)
+
+    def _material(self, name: str | None) -> dict:
+        return self.materials.setdefault(name, {"density": None, "elastic_modulus": None, "poisson_ratio": None})
+
+    @profiled("inp.read")
+    def _read_file(self, path: str | None = None) -> str:
+        if path is None:
+            if not self.inp_file.endswith(".inp"):
+                raise ValueError(f"File {self.inp_file} does not have a .inp extension")
+            path = self.inp_file
+        try:
+            with open(path, "r") as file:
+                return file.read()
+        except Exception as e:
+            raise RuntimeError(f"Error reading file {path}: {e}")
+
+    @profiled("inp.map")
+    def _map_file(self, path: str | None = None) -> mmap.mmap:
+        if path is None:
+            if not self.inp_file.endswith(".inp"):
+                raise ValueError(f"File {self.inp_file} does not have a .inp extension")
+            path = self.inp_file
+        try:
+            with open(path, "rb") as file:
+                return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception as e:
+            raise RuntimeError(f"Error reading file {path}: {e}")
 
     @staticmethod
-    def extract_str(inp_contents: str, start_keyword: str, end_keyword: str) -> str:
+    def extract_str(inp_contents: str | bytes, start_keyword: str, end_keyword: str) -> str | bytes:
         """
-        Returns the extracted node, x, y, z table string from an inp_file
+        Returns the extracted node, x, y, z table string from an inp_file.
+        Byte contents (e.g. an mmap) are searched for the encoded keywords and return bytes.
         """
+        if not isinstance(inp_contents, str):
+            start_keyword = start_keyword.encode()
+            end_keyword = end_keyword.encode()
         start_index = inp_contents.find(start_keyword)
         start_index += len(start_keyword)
         end_index = inp_contents.find(end_keyword, start_index)
@@ -48,51 +154,171 @@ class INPParser:
         return table_str
 
     @staticmethod
-    def str_to_df(contents: str) -> pd.DataFrame:
-        """
-        Returns a dataframe from the extracted table string in extract_table
-        """
-        start_keyword = "*NODE"
-        end_keyword = "**HWCOLOR COMP"
-        table = INPParser.extract_str(contents, start_keyword, end_keyword)
-
-        node_df = pd.read_csv(
-            StringIO(table),
-            sep=r'[,\s]+',
-            header=None,
-            names=[
-                'node_no',
-                'x',
-                'y',
-                'z'
-            ],
-            engine='python'
-        )
+    @profiled("inp.index_keywords")
+    def index_keywords(contents: str | bytes) -> list[tuple[str, dict[str, str], int, int]]:
+        """
+        Returns every keyword block of the contents, found in a single scan over the keyword lines.
 
-        return node_df
-    
-    def get_density(self, contents: str) -> float:
+        Returns:
+        list: (keyword, options, start, end) per block, in file order
+            keyword: upper-case keyword name, e.g. 'NODE', 'ELASTIC', 'NODE OUTPUT'
+            options: {OPTION: value} with upper-case option names, e.g. {'TYPE': 'ISOTROPIC'}
+            start, end: offsets of the data lines of the block, from the line after the keyword line up to
+                the next keyword line. Comment lines (**) are not keywords and stay within the data lines.
         """
-        Extracts the density value from the .inp file contents.
+        is_str = isinstance(contents, str)
+        star = "*" if is_str else b"*"
+        newline = "\n" if is_str else b"\n"
+        next_line = "\n*" if is_str else b"\n*"
+        length = len(contents)
+
+        keywords = []
+        line_start = 0 if contents[:1] == star else contents.find(next_line) + 1
+        if line_start == 0 and contents[:1] != star:
+            return []
+        while True:
+            line_end = contents.find(newline, line_start)
+            if line_end == -1:
+                line_end = length
+            if contents[line_start + 1:line_start + 2] != star:
+                line = contents[line_start + 1:line_end]
+                if not is_str:
+                    line = line.decode("utf-8", errors="replace")
+                name, *option_strs = line.strip().split(",")
+                options = {}
+                for option in option_strs:
+                    key, _, value = option.partition("=")
+                    if key.strip():
+                        options[" ".join(key.split()).upper()] = value.strip()
+                if keywords:
+                    keywords[-1][3] = line_start
+                keywords.append([" ".join(name.split()).upper(), options, min(line_end + 1, length), length])
+            line_start = contents.find(next_line, line_end) + 1
+            if line_start == 0:
+                break
+        return [tuple(keyword) for keyword in keywords]
+
+    @staticmethod
+    def _input_path(path: str, keyword: str, options: dict[str, str]) -> str | None:
+        """
+        Returns the file read by an *INCLUDE or *NODE, INPUT=... block, relative to the directory of path.
         """
-        density_keyword = "*DENSITY"
-        density_str = INPParser.extract_str(contents, density_keyword, ",")
+        if keyword not in ("INCLUDE", "NODE") or not options.get("INPUT"):
+            return None
+        return os.path.join(os.path.dirname(path), options["INPUT"].strip('"'))
 
-        try:
-            return float(density_str.strip())
-        except ValueError:
-            print(density_str)
-            raise ValueError(f"Invalid density value: {density_str.strip()}")
-        
-    def get_elastic_modulus(self, contents: str) -> float:
+    @staticmethod
+    def included_files(inp_file: str) -> list[str]:
         """
-        Extracts the elastic modulus value from the .inp file contents.
+        Returns the paths of every file read through *INCLUDE or *NODE, INPUT=... by the .inp file, recursively,
+        scanning only the keyword lines.
         """
-        elastic_modulus_keyword = "*ELASTIC, TYPE = ISOTROPIC"
-        elastic_modulus_str = INPParser.extract_str(contents, elastic_modulus_keyword, ",")
+        files = []
+        pending = [inp_file]
+        while pending:
+            path = pending.pop()
+            if os.path.getsize(path) == 0:
+                continue
+            with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as contents:
+                for keyword, options, _, _ in INPParser.index_keywords(contents):
+                    input_path = INPParser._input_path(path, keyword, options)
+                    if input_path is not None and input_path not in files:
+                        files.append(input_path)
+                        if keyword == "INCLUDE":
+                            pending.append(input_path)
+        return files
 
+    @staticmethod
+    @profiled("inp.parse_nodes")
+    def parse_node_block(block: str | bytes) -> np.ndarray:
+        """
+        Converts the data lines of one *NODE block ("node_no, x, y, z", commas and/or spaces) into a
+        (n_nodes, 4) float64 array, without going through a regex tokenizer.
+        """
+        if isinstance(block, str):
+            block = block.encode()
+        if b"**" in block:
+            block = b"\n".join(line for line in block.splitlines() if not line.lstrip().startswith(b"**"))
         try:
-            return float(elastic_modulus_str.strip())
+            return parse_table(block.replace(b",", b" "), 4)
         except ValueError:
-            raise ValueError(f"Invalid elastic modulus value: {elastic_modulus_str.strip()}")
+            # Rows with missing coordinates (e.g. 2D nodes) are left to the general regex reader
+            return pd.read_csv(
+                BytesIO(block),
+                sep=r'[,\s]+',
+                header=None,
+                names=['node_no', 'x', 'y', 'z'],
+                engine='python'
+            ).to_numpy(dtype=np.float64)
+
+    @staticmethod
+    @profiled("inp.nodes_to_df")
+    def nodes_to_df(node_blocks: list[np.ndarray]) -> pd.DataFrame:
+        """
+        Returns a dataframe ['node_no', 'x', 'y', 'z'] from the (n_nodes, 4) arrays of parse_node_block
+        """
+        if not node_blocks:
+            raise ValueError("Keyword '*NODE' not found in file.")
+        table = np.concatenate(node_blocks)
+
+        node_df = pd.DataFrame(table[:, 1:], columns=['x', 'y', 'z'])
+        node_df.insert(0, 'node_no', table[:, 0].astype(np.int64))
+        return node_df
+
+    @staticmethod
+    def str_to_df(contents: str | bytes) -> pd.DataFrame:
+        """
+        Returns a dataframe ['node_no', 'x', 'y', 'z'] of the nodes of every *NODE block in the contents.
+        Included files are not read; use INPParser(inp_file).node_df for those.
+        """
+        return INPParser.nodes_to_df([
+            INPParser.parse_node_block(contents[start:end])
+            for keyword, options, start, end in INPParser.index_keywords(contents)
+            if keyword == "NODE" and not options.get("INPUT")
+        ])
 
+    @staticmethod
+    def _data_values(block: str | bytes, name: str) -> list[float]:
+        """
+        Returns the values of the first data line of a keyword block, e.g. [E, nu] of *ELASTIC.
+        """
+        if not isinstance(block, str):
+            block = block.decode("utf-8", errors="replace")
+        for line in block.splitlines():
+            line = line.strip()
+            if not line or line.startswith("**"):
+                continue
+            try:
+                return [float(value) for value in line.split(",") if value.strip()]
+            except ValueError:
+                raise ValueError(f"Invalid {name} value: {line}")
+        raise ValueError(f"Invalid {name} value: no data line")
+
+    def _material_value(self, material: str | None, key: str, keyword: str) -> float:
+        if material is not None:
+            if material not in self.materials:
+                raise ValueError(f"Material {material} not found. Available: {list(self.materials)}")
+            value = self.materials[material][key]
+            if value is None:
+                raise ValueError(f"Material {material} does not define {keyword}.")
+            return value
+
+        defined = {name: values[key] for name, values in self.materials.items() if values[key] is not None}
+        if not defined:
+            raise ValueError(f"Keyword '{keyword}' not found in file.")
+        name, value = next(iter(defined.items()))
+        if len(set(defined.values())) > 1:
+            print(f"Warning: {len(defined)} materials define {keyword} with different values, using material {name}.")
+        return value
+
+    def get_density(self, material: str | None = None) -> float:
+        """
+        Returns the density of a material (default: the first material that defines one).
+        """
+        return self._material_value(material, "density", "*DENSITY")
+
+    def get_elastic_modulus(self, material: str | None = None) -> float:
+        """
+        Returns the isotropic elastic modulus of a material (default: the first material that defines one).
+        """
+        return self._material_value(material, "elastic_modulus", "*ELASTIC, TYPE = ISOTROPIC")
@@ -0,0 +1,81 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+class LRUCache:
+    """
+    LRUCache is a least-recently-used cache bounded by the memory held by its values rather than
+    by the number of entries. Least recently used values are evicted until a new value fits.
+    Attributes:
+        max_bytes (int): Memory budget of the cache. A budget of 0 disables caching.
+        current_bytes (int): Memory currently held by cached values.
+        hits (int): Number of lookups served from the cache.
+        misses (int): Number of lookups not found in the cache.
+    Methods:
+        get(key): Returns the cached value for key, or None if it is not cached.
+        put(key, value): Caches value under key, evicting least recently used values to stay within budget.
+        clear(): Removes all cached values. Counters are kept.
+        info() -> dict: Returns hit/miss counters and memory usage.
+    """
+    def __init__(self, max_mb: float):
+        if max_mb < 0:
+            raise ValueError(f"max_mb must be non-negative. Provided: {max_mb}")
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict() # key -> (value, nbytes)
+
+    @staticmethod
+    def sizeof(value) -> int:
+        """
+        Returns the memory held by a DataFrame or array value in bytes.
+        """
+        if isinstance(value, pd.DataFrame):
+            return int(value.memory_usage(index=True, deep=True).sum())
+        if isinstance(value, np.ndarray):
+            return value.nbytes
+        raise TypeError(f"Cannot size values of type {type(value).__name__}")
+
+    def get(self, key):
+        if key not in self._entries:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return self._entries[key][0]
+
+    def put(self, key, value) -> None:
+        nbytes = self.sizeof(value)
+        if key in self._entries:
+            self.current_bytes -= self._entries.pop(key)[1]
+        if nbytes > self.max_bytes:
+            return
+
+        while self.current_bytes + nbytes > self.max_bytes:
+            _, (_, evicted_bytes) = self._entries.popitem(last=False)
+            self.current_bytes -= evicted_bytes
+
+        self._entries[key] = (value, nbytes)
+        self.current_bytes += nbytes
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.current_bytes = 0
+
+    def info(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "size_mb": self.current_bytes / (1024 * 1024),
+            "max_size_mb": self.max_bytes / (1024 * 1024),
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
@@ -1,39 +1,271 @@
+from typing import Iterator
+
+import numpy as np
 import pandas as pd
 
-from core.parser.datParser import DATParser
+from core.parser.datParser import DATParser, DTYPES, compact_ids
 from core.parser.inpParser import INPParser
+from core.parser.lruCache import LRUCache
+from core.parser.modelCache import ModelCache, file_digest, model_key
+from core.parser.nodeGeometry import NodeGeometry
+from core.profiling import stage
     
 class ModalParser:
     """
     ModalParser parses modal analysis data from DAT and INP files. It takes the mode_df from DAT files, and the
     node_df from INP files and combines them.
+    Construction only reads the eigenvalue table at the head of the .dat file, so mode_table_df is available at once
+    whatever the file size; node coordinates and eigenvectors are parsed when first accessed.
+    If a cache_dir is given, the parsed model is stored there (see core.parser.modelCache) and later
+    instances for files with the same contents load it instead of parsing the files. The displacements are
+    written to the cache one chunk at a time and read back memory-mapped, so caching a model never holds all
+    its modes in memory.
+    A mode_index built while the .dat file was written (see core.parser.datIndexer) skips the scan of the
+    .dat file for its eigenvector tables; it holds byte offsets and requires use_mmap=True.
+    A cache_key computed while the files were written (model_key of their digests) saves hashing them again.
+    With dtype="float32", node coordinates and displacements are stored as float32 and node numbers as int32,
+    halving the memory of large models; metrics computed from them are still accumulated in float64.
     Attributes:
-        dat (DATParser): Parser for the DAT file.
+        dat (DATParser or None): Parser for the DAT file. None when the model was loaded from cache_dir.
+        cache_key (str or None): Content-hash key of the model in cache_dir, if one was given.
+        cache_hit (bool): True if the model was loaded from cache_dir instead of parsed.
+        dtype (str): Storage type of coordinates and displacements, "float64" or "float32".
         mode_table_df (pd.DataFrame): DataFrame containing mode numbers and frequencies.
         max_modes (int): Maximum mode number available.
-        node_df (pd.DataFrame or None): DataFrame containing node coordinates, if provided.
+        node_df (pd.DataFrame or None): DataFrame containing node coordinates, parsed from the .inp file on first access.
+        mode_cache (LRUCache): Memory-bounded cache of the per-mode displacement arrays.
+        geometry (NodeGeometry): Radial/tangential frame of the nodes, computed once on first access.
     Methods:
         __call__(mode_no, include_node=False): Returns mode data for the given mode number, optionally including node coordinates.
-        mode_node_df(mode_no): Returns mode data merged with node coordinates for the specified mode number.
+        mode_node_df(mode_no): Returns mode data joined with node coordinates (in .dat row order) for the specified mode number.
+        mode_displacements(mode_no): Returns the (N, 3) displacements of a mode aligned with geometry.
+        get_displacements(): Returns the displacements of all modes aligned with geometry.
+        iter_mode_chunks(mode_no, chunk_size): Yields the displacements of a mode chunk_size nodes at a time, without caching them.
+        cache_info(): Returns the hit/miss counters and memory usage of the mode cache.
     """
-    def __init__(self, dat_file: str, inp_file: str):
-        self.dat = DATParser(dat_file)
-        self.node_df = INPParser(inp_file).node_df # ['node_no', 'x', 'y', 'z']
+    def __init__(
+        self,
+        dat_file: str,
+        inp_file: str,
+        cache_size_mb: float = 256,
+        parser_engine: str = "numpy",
+        use_mmap: bool = False,
+        cache_dir: str | None = None,
+        mode_index: dict[int, tuple[int, int]] | None = None,
+        cache_key: str | None = None,
+        dtype: str = "float64",
+    ):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {DTYPES}. Provided: {dtype}")
+        self.dtype = dtype
+        self.dat = None
+        self.cache_key = None
+        self._inp_file = inp_file
+        self._use_mmap = use_mmap
+        self._node_df = None # parsed from inp_file on first access
+        self._displacements = None # (mode_numbers, node_numbers, displacements) when loaded from cache_dir
+        self._geometry = None
+        self._node_numbers = None
+        self._geometry_rows = None # geometry row of every .dat row, -1 for unmatched nodes
+
+        cached = None
+        if cache_dir is not None:
+            model_cache = ModelCache(cache_dir)
+            self.cache_key = cache_key
+            if self.cache_key is None:
+                # Files included by the .inp file are part of the model too
+                inp_digest = ":".join(file_digest(path) for path in [inp_file, *INPParser.included_files(inp_file)])
+                self.cache_key = model_key(file_digest(dat_file), inp_digest)
+            # Compact models are stored apart, so full-precision models are never loaded from float32 arrays
+            storage_key = self.cache_key if dtype == "float64" else f"{self.cache_key}-{dtype}"
+            cached = model_cache.load(storage_key)
+
+        self.cache_hit = cached is not None
+        if cached is not None:
+            self.mode_table_df = pd.DataFrame({'mode_no': cached['mode_no'], 'freq': cached['freq']})
+            self._node_df = pd.DataFrame(cached['inp_xyz'], columns=['x', 'y', 'z'])
+            self._node_df.insert(0, 'node_no', cached['inp_node_no'])
+            self._displacements = (cached['disp_mode_no'], cached['dat_node_no'], cached['displacements'])
+        else:
+            # Only the eigenvalue table is read here; nodes and eigenvectors are parsed when first needed
+            self.dat = DATParser(dat_file, parser_engine=parser_engine, use_mmap=use_mmap, mode_index=mode_index, dtype=dtype)
+            self.mode_table_df = self.dat.mode_table_df # ['mode_no', 'freq']
+            if cache_dir is not None:
+                cached = self._save(model_cache, storage_key)
+                if cached is not None:
+                    self._displacements = (cached['disp_mode_no'], cached['dat_node_no'], cached['displacements'])
+
+        self.max_modes = self.mode_table_df['mode_no'].max().item()
+
+        self.mode_cache = LRUCache(cache_size_mb)
+
+    @property
+    def node_df(self) -> pd.DataFrame | None:
+        if self._node_df is None and self._inp_file is not None:
+            node_df = INPParser(self._inp_file, use_mmap=self._use_mmap).node_df # ['node_no', 'x', 'y', 'z']
+            self._node_df = self.compact_node_df(node_df) if self.dtype == "float32" else node_df
+        return self._node_df
 
-        self.mode_table_df = self.dat.get_mode_table_df() # ['mode_no', 'freq']
-        self.max_modes = self.dat.mode_table_df['mode_no'].max().item()
+    def _save(self, model_cache: ModelCache, storage_key: str) -> dict[str, np.ndarray] | None:
+        """
+        Stores the model in model_cache, parsing and writing its displacements one chunk at a time,
+        and returns the stored arrays as ModelCache.load does.
+        """
+        mode_numbers = np.array(sorted(self.dat.mode_index), dtype=np.int64)
+        node_numbers = self._get_node_numbers()
+        if self.dtype == "float32":
+            node_numbers = compact_ids(node_numbers)
+        blocks = (
+            ((i, slice(row_offset, row_offset + len(U))), U)
+            for i, row_offset, U in self.dat.iter_displacements()
+        )
+        model_cache.save(
+            storage_key,
+            {
+                'mode_no': self.mode_table_df['mode_no'].to_numpy(),
+                'freq': self.mode_table_df['freq'].to_numpy(),
+                'inp_node_no': self.node_df['node_no'].to_numpy(),
+                'inp_xyz': self.node_df[['x', 'y', 'z']].to_numpy(dtype=self.dtype),
+                'disp_mode_no': mode_numbers,
+                'dat_node_no': node_numbers,
+            },
+            streamed={'displacements': ((len(mode_numbers), len(node_numbers), 3), self.dtype, blocks)},
+        )
+        return model_cache.load(storage_key)
+
+    @staticmethod
+    def compact_node_df(node_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Returns node_df ['node_no', 'x', 'y', 'z'] with float32 coordinates and int32 node numbers (where they fit).
+        """
+        compact = node_df[['x', 'y', 'z']].astype(np.float32)
+        compact.insert(0, 'node_no', compact_ids(node_df['node_no'].to_numpy()))
+        return compact
+
+    def _get_all_displacements(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if self._displacements is None:
+            return self.dat.get_displacements()
+        return self._displacements
+
+    def _get_node_numbers(self) -> np.ndarray:
+        if self._node_numbers is None:
+            self._node_numbers = self.dat.get_node_numbers() if self._displacements is None else self._displacements[1]
+        return self._node_numbers
 
     def __call__(self, mode_no: int):
         if mode_no < 1 or mode_no > self.max_modes:
             raise ValueError(f"mode_no must be between 1 and {self.max_modes}. Provided: {mode_no}")
-        
+
         return self.mode_node_df(mode_no)
+
+    def cache_info(self) -> dict:
+        return self.mode_cache.info()
+
+    @property
+    def geometry(self) -> NodeGeometry:
+        if self._geometry is None:
+            if self.node_df is None:
+                raise ValueError("No node DataFrame loaded. Please provide an inp_file.")
+            node_numbers = self._get_node_numbers()
+            with stage("model.geometry"):
+                # Matches .dat rows to .inp nodes, in place of a node_no merge
+                self._geometry = NodeGeometry(self.node_df, node_numbers)
+            if len(self._geometry.unmatched_dat_nodes):
+                print(
+                    f"Warning: {len(self._geometry.unmatched_dat_nodes)} nodes of the .dat file are missing from the .inp file "
+                    f"and will be ignored (e.g. {self._geometry.unmatched_dat_nodes[:5].tolist()})."
+                )
+        return self._geometry
+
+    def mode_displacements(self, mode_no: int) -> np.ndarray:
+        """
+        Returns the (N, 3) [U1, U2, U3] displacements of a mode, row i belonging to node geometry.node_no[i].
+        Results are cached and shared between calls, so they should be treated as read-only.
+        """
+        if mode_no < 1 or mode_no > self.max_modes:
+            raise ValueError(f"mode_no must be between 1 and {self.max_modes}. Provided: {mode_no}")
+
+        U = self.mode_cache.get(mode_no)
+        if U is None and self._displacements is not None:
+            mode_numbers, _, displacements = self._displacements
+            i = np.searchsorted(mode_numbers, mode_no)
+            if i == len(mode_numbers) or mode_numbers[i] != mode_no:
+                raise ValueError(f"Mode number {mode_no} not found.")
+            U = np.ascontiguousarray(displacements[i][self.geometry.dat_rows], dtype=self.dtype)
+            self.mode_cache.put(mode_no, U)
+        elif U is None:
+            table = self.dat.get_mode_array(mode_no)
+            if not self.geometry.aligned:
+                table = table[self.geometry.dat_rows]
+            if not np.array_equal(table[:, 0], self.geometry.node_no):
+                raise ValueError(f"Mode number {mode_no} does not list the same nodes as the first mode.")
+            U = np.ascontiguousarray(table[:, 1:], dtype=self.dtype)
+            self.mode_cache.put(mode_no, U)
+        return U
     
     def mode_node_df(self, mode_no):
-        if self.node_df is None:
-            raise ValueError("No node DataFrame loaded. Please provide an inp_file.")
+        geometry = self.geometry
+        U = self.mode_displacements(mode_no)
+        df = pd.DataFrame({
+            'node_no': geometry.node_no,
+            'x': geometry.xyz[:, 0],
+            'y': geometry.xyz[:, 1],
+            'z': geometry.xyz[:, 2],
+            'U1': U[:, 0],
+            'U2': U[:, 1],
+            'U3': U[:, 2],
+        })
+        return df
+
+    def get_displacements(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns all modes at once.
+
+        Returns:
+        tuple: (mode_numbers, displacements)
+            mode_numbers: (n_modes,) sorted mode numbers
+            displacements: (n_modes, N, 3) array of [U1, U2, U3], axis 1 aligned with geometry
+        """
+        mode_numbers, _, displacements = self._get_all_displacements()
+        if not self.geometry.aligned:
+            displacements = displacements[:, self.geometry.dat_rows]
+        return mode_numbers, displacements
+
+    def iter_mode_chunks(self, mode_no: int, chunk_size: int = 100000) -> Iterator[tuple[slice | np.ndarray, np.ndarray]]:
+        """
+        Reads the displacements of a mode about chunk_size nodes at a time, from the .dat file or the cached model,
+        so memory stays bounded by one chunk however large the model is. Chunks are not kept in mode_cache.
+
+        Returns:
+        Iterator: (rows, U) pairs
+            rows: slice or index array of the geometry rows of the chunk
+            U: (n, 3) [U1, U2, U3] displacements of those rows
+        """
+        if mode_no < 1 or mode_no > self.max_modes:
+            raise ValueError(f"mode_no must be between 1 and {self.max_modes}. Provided: {mode_no}")
+        geometry = self.geometry
+
+        if self._displacements is not None:
+            mode_numbers, _, displacements = self._displacements
+            i = np.searchsorted(mode_numbers, mode_no)
+            if i == len(mode_numbers) or mode_numbers[i] != mode_no:
+                raise ValueError(f"Mode number {mode_no} not found.")
+            for start in range(0, len(geometry.node_no), chunk_size):
+                dat_rows = geometry.dat_rows[start:start + chunk_size]
+                yield slice(start, start + len(dat_rows)), np.asarray(displacements[i][dat_rows], dtype=np.float64)
+            return
 
-        mode_df = self.dat.get_mode_df(mode_no)
-        merged_df = pd.merge(self.node_df, mode_df, on='node_no', how='inner')
-        df = merged_df
-        return df
\ No newline at end of file
+        node_numbers = self._get_node_numbers()
+        if not geometry.aligned and self._geometry_rows is None:
+            self._geometry_rows = np.full(len(node_numbers), -1, dtype=np.int64)
+            self._geometry_rows[geometry.dat_rows] = np.arange(len(geometry.dat_rows))
+        for row_offset, table in self.dat.iter_mode_array(mode_no, chunk_size):
+            rows = slice(row_offset, row_offset + len(table))
+            if not np.array_equal(table[:, 0], node_numbers[rows]):
+                raise ValueError(f"Mode number {mode_no} does not list the same nodes as the first mode.")
+            if geometry.aligned:
+                yield rows, table[:, 1:]
+            else:
+                geometry_rows = self._geometry_rows[rows]
+                matched = geometry_rows >= 0
+                yield geometry_rows[matched], table[matched, 1:]
@@ -0,0 +1,111 @@
+import hashlib
+import os
+import shutil
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+from core.profiling import profiled
+
+# Bump whenever parsing changes what is stored, so stale entries are not reused
+PARSER_VERSION = 2
+
+MODEL_ARRAYS = (
+    "mode_no",          # (n_modes,) mode numbers of the eigenvalue table
+    "freq",             # (n_modes,) frequencies (cycles/time) of the eigenvalue table
+    "inp_node_no",      # (n_inp_nodes,) node numbers of the .inp file
+    "inp_xyz",          # (n_inp_nodes, 3) node coordinates of the .inp file
+    "disp_mode_no",     # (n_disp_modes,) mode numbers of the eigenvector tables
+    "dat_node_no",      # (n_dat_nodes,) node numbers of the eigenvector tables, in row order
+    "displacements",    # (n_disp_modes, n_dat_nodes, 3) [U1, U2, U3]
+)
+
+
+@profiled("cache.hash")
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Returns the SHA-256 hex digest of a file's contents, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def model_key(dat_digest: str, inp_digest: str) -> str:
+    """
+    Returns the cache key of a .dat/.inp pair from their content digests and PARSER_VERSION.
+    """
+    return hashlib.sha256(f"{dat_digest}:{inp_digest}:v{PARSER_VERSION}".encode()).hexdigest()
+
+
+class ModelCache:
+    """
+    ModelCache stores parsed models on disk as one directory of .npy files per model, named by the
+    model key. Arrays are loaded memory-mapped, so a cached model opens without reading its displacements.
+    Attributes:
+        cache_dir (Path): Directory holding the cached models.
+    Methods:
+        path(key): Returns the directory of a cached model.
+        load(key): Returns the MODEL_ARRAYS of a cached model, or None if it is not cached.
+        save(key, arrays, streamed=None): Stores the MODEL_ARRAYS of a model, optionally writing some block by block.
+    """
+    def __init__(self, cache_dir: str | Path):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def path(self, key: str) -> Path:
+        return self.cache_dir / key
+
+    @profiled("cache.load")
+    def load(self, key: str) -> dict[str, np.ndarray] | None:
+        model_dir = self.path(key)
+        if not model_dir.is_dir():
+            return None
+        try:
+            arrays = {name: np.load(model_dir / f"{name}.npy", mmap_mode="r") for name in MODEL_ARRAYS}
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring unreadable cached model {model_dir}: {e}")
+            return None
+        try:
+            # The directory's mtime records its last use, for caches that evict least recently used models
+            os.utime(model_dir)
+        except OSError:
+            pass
+        return arrays
+
+    @profiled("cache.save")
+    def save(self, key: str, arrays: dict[str, np.ndarray], streamed: dict[str, tuple] | None = None) -> None:
+        """
+        Stores the MODEL_ARRAYS of a model. Arrays too large to hold in memory can be given in streamed instead,
+        as {name: (shape, dtype, blocks)}: every (index, values) pair yielded by blocks is written to array[index]
+        of the memory-mapped .npy file, so only one block is in memory at a time.
+        """
+        streamed = streamed or {}
+        missing = set(MODEL_ARRAYS) - set(arrays) - set(streamed)
+        if missing:
+            raise ValueError(f"Missing arrays for cached model: {sorted(missing)}")
+
+        # Write into a private directory first, so readers never see a partial model
+        tmp_dir = self.cache_dir / f".{key}.{uuid.uuid4().hex}.tmp"
+        tmp_dir.mkdir()
+        try:
+            for name in MODEL_ARRAYS:
+                if name in streamed:
+                    shape, dtype, blocks = streamed[name]
+                    array = np.lib.format.open_memmap(tmp_dir / f"{name}.npy", mode="w+", dtype=dtype, shape=shape)
+                    for index, values in blocks:
+                        array[index] = values
+                    array.flush()
+                    del array
+                else:
+                    np.save(tmp_dir / f"{name}.npy", np.ascontiguousarray(arrays[name]))
+            os.replace(tmp_dir, self.path(key))
+        except OSError:
+            # Another process stored the same model first
+            if not self.path(key).is_dir():
+                raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+
+class NodeGeometry:
+    """
+    NodeGeometry holds the in-plane (x-z) frame of a model's nodes. Node coordinates do not change between
+    modes, so the frame is computed once and every per-mode metric reduces to dot products against it.
+    Nodes are kept in .dat row order and restricted to nodes present in both the .dat and .inp files.
+    Attributes:
+        node_no (np.ndarray): (N,) node numbers in .dat row order
+        dat_rows (np.ndarray): (N,) row of each node in the .dat eigenvector tables
+        inp_rows (np.ndarray): (N,) row of each node in the .inp node table
+        unmatched_dat_nodes (np.ndarray): node numbers of the .dat file missing from the .inp file
+        unmatched_inp_nodes (np.ndarray): node numbers of the .inp file missing from the .dat file
+        xyz (np.ndarray): (N, 3) node coordinates [x, y, z]
+        centroid (tuple[float, float]): (ctr_x, ctr_z), mean x and z of the nodes
+        r_len (np.ndarray): (N,) in-plane distance of each node from the centroid
+        r_hat (np.ndarray): (N, 3) radial unit vectors <r_x, 0, r_z> / r_len
+        t_hat (np.ndarray): (N, 3) tangential unit vectors, +Y x r_hat
+        has_centroid_node (bool): True if a node lies on the centroid, where r_hat and t_hat are undefined (set to 0)
+        aligned (bool): True if every .dat row maps to a node in order, so .dat tables need no reindexing
+    Methods:
+        align(node_numbers, inp_node_numbers): Returns the matching (dat_rows, inp_rows) of two node number arrays.
+    """
+    def __init__(self, node_df: pd.DataFrame, node_numbers: np.ndarray):
+        """
+        Parameters:
+        node_df (pd.DataFrame): DataFrame ['node_no', 'x', 'y', 'z'] from the .inp file
+        node_numbers (np.ndarray): node numbers in .dat row order
+        """
+        node_numbers = np.asarray(node_numbers)
+        inp_node_numbers = node_df['node_no'].to_numpy()
+        self.dat_rows, self.inp_rows = self.align(node_numbers, inp_node_numbers)
+        self.node_no = node_numbers[self.dat_rows]
+        self.aligned = len(self.dat_rows) == len(node_numbers)
+
+        matched_dat = np.zeros(len(node_numbers), dtype=bool)
+        matched_dat[self.dat_rows] = True
+        matched_inp = np.zeros(len(inp_node_numbers), dtype=bool)
+        matched_inp[self.inp_rows] = True
+        self.unmatched_dat_nodes = node_numbers[~matched_dat]
+        self.unmatched_inp_nodes = inp_node_numbers[~matched_inp]
+
+        self.xyz = node_df[['x', 'y', 'z']].to_numpy(dtype=np.float64)[self.inp_rows]
+
+        ctr_x = self.xyz[:, 0].mean()
+        ctr_z = self.xyz[:, 2].mean()
+        self.centroid = (ctr_x, ctr_z)
+
+        rx = self.xyz[:, 0] - ctr_x
+        rz = self.xyz[:, 2] - ctr_z
+        self.r_len = np.hypot(rx, rz)
+        self.has_centroid_node = bool(np.any(self.r_len == 0))
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r_hat_x = np.nan_to_num(rx / self.r_len)
+            r_hat_z = np.nan_to_num(rz / self.r_len)
+        zeros = np.zeros_like(r_hat_x)
+        self.r_hat = np.stack([r_hat_x, zeros, r_hat_z], axis=1)
+        self.t_hat = np.stack([r_hat_z, zeros, -r_hat_x], axis=1)
+
+    def __len__(self) -> int:
+        return len(self.node_no)
+
+    @staticmethod
+    def align(node_numbers: np.ndarray, inp_node_numbers: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Matches .dat node numbers against .inp node numbers with a sorted lookup instead of a join.
+
+        Returns:
+        tuple: (dat_rows, inp_rows), such that node_numbers[dat_rows] == inp_node_numbers[inp_rows],
+            in .dat row order. Nodes missing from either side are left out.
+        """
+        if len(node_numbers) == 0 or len(inp_node_numbers) == 0:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty
+
+        order = np.argsort(inp_node_numbers, kind='stable')
+        sorted_numbers = inp_node_numbers[order]
+        pos = np.searchsorted(sorted_numbers, node_numbers)
+        pos[pos == len(sorted_numbers)] = 0
+        matched = sorted_numbers[pos] == node_numbers
+
+        dat_rows = np.flatnonzero(matched)
+        inp_rows = order[pos[matched]]
+        return dat_rows, inp_rows
@@ -0,0 +1,175 @@
+import numpy as np
+
+# Powers of ten that are exact in float64, so mantissa * 10**k (or / 10**-k) rounds only once
+_EXACT_POW10 = 10.0 ** np.arange(23)
+_MAX_EXACT_MANTISSA = 2.0**53
+# Digits of an integer whose value is guaranteed below 2**53
+_MAX_DIGITS = 15
+
+# Space, tab and carriage return all sort at or below ' '
+_BLANK_MAX = ord(' ')
+_DIGIT_0 = ord('0')
+
+CHUNK_ROWS = 16384
+
+
+def parse_table(block: str | bytes, n_cols: int) -> np.ndarray:
+    """
+    Parses a block of whitespace-delimited numeric rows (e.g. an Abaqus .dat table) into a float64 array.
+    Fixed-width rows, as written by Abaqus, are decoded column-wise without tokenizing; rows
+    without that layout fall back to parse_table_split.
+
+    Parameters:
+    block (str or bytes): The table rows, without header or footer.
+    n_cols (int): Number of values per row.
+
+    Returns:
+    np.ndarray: (n_rows, n_cols) float64 array.
+    """
+    if isinstance(block, str):
+        block = block.encode('utf-8')
+    block = block.strip(b'\r\n')
+    if not block:
+        return np.empty((0, n_cols), dtype=np.float64)
+
+    table = _parse_fixed_width(block, n_cols)
+    if table is None:
+        table = parse_table_split(block, n_cols)
+    return table
+
+
+def parse_table_split(block: str | bytes, n_cols: int) -> np.ndarray:
+    """
+    Parses a block of whitespace-delimited numeric rows by splitting it into tokens.
+    """
+    values = np.array(block.split(), dtype=np.float64)
+    if values.size % n_cols != 0:
+        raise ValueError(f"Table does not have {n_cols} values per row")
+    return values.reshape(-1, n_cols)
+
+
+def _parse_fixed_width(block: bytes, n_cols: int) -> np.ndarray | None:
+    """
+    Decodes a block whose rows all have the same length, CHUNK_ROWS rows at a time. Chunks whose fields
+    do not line up are split instead. Returns None if the rows do not all have the same length.
+    """
+    line_len = block.find(b'\n') + 1
+    if line_len == 0:
+        line_len = len(block) + 1
+    # Trailing blanks of the last row may have been stripped with the footer
+    last_len = len(block) - block.rfind(b'\n') - 1
+    if last_len < line_len - 1:
+        block += b' ' * (line_len - 1 - last_len)
+    if (len(block) + 1) % line_len != 0:
+        return None
+
+    lines = np.frombuffer(block + b'\n', dtype=np.uint8).reshape(-1, line_len)
+    if not np.all(lines[:, -1] == ord('\n')):
+        return None
+    chars = lines[:, :-1]
+
+    table = np.empty((len(chars), n_cols), dtype=np.float64)
+    for start in range(0, len(chars), CHUNK_ROWS):
+        chunk = _parse_rows(chars[start:start + CHUNK_ROWS], n_cols)
+        if chunk is None:
+            # Split with the newlines, so the last token of a row and the first of the next stay apart
+            chunk = parse_table_split(lines[start:start + CHUNK_ROWS].tobytes(), n_cols)
+        table[start:start + CHUNK_ROWS] = chunk
+    return table
+
+
+def _parse_rows(chars: np.ndarray, n_cols: int) -> np.ndarray | None:
+    """
+    Decodes (n_rows, line_len) characters whose fields occupy the same character columns in every row.
+    """
+    # Work on character columns, so every operation runs along the long row axis
+    columns = np.ascontiguousarray(chars.T)
+
+    # Fields are the runs of character columns that are not blank in every row
+    used = np.any(columns > _BLANK_MAX, axis=1)
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], used, [False])).astype(np.int8)))
+    if len(edges) != 2 * n_cols:
+        return None
+
+    table = np.empty((len(chars), n_cols), dtype=np.float64)
+    for col in range(n_cols):
+        values = _parse_field(columns[edges[2 * col]:edges[2 * col + 1]])
+        if values is None:
+            return None
+        table[:, col] = values
+    return table
+
+
+def _parse_field(field: np.ndarray) -> np.ndarray | None:
+    """
+    Decodes one right-aligned field, given as (width, n_rows) character columns, of integers or decimals
+    [-]ddd[.ddd][E[+-]dd] where the decimal point and exponent marker sit in the same column in every row.
+    """
+    is_exp = (field == ord('E')) | (field == ord('e'))
+    exp_cols = np.flatnonzero(np.any(is_exp, axis=1))
+    dot_cols = np.flatnonzero(np.any(field == ord('.'), axis=1))
+    if len(exp_cols) > 1 or len(dot_cols) > 1:
+        return None
+
+    mantissa_end = len(field)
+    exponent = 0
+    if len(exp_cols):
+        mantissa_end = exp_cols[0]
+        if not np.all(is_exp[mantissa_end]):
+            return None
+        exponent = _parse_int(field[mantissa_end + 1:])
+        if exponent is None:
+            return None
+
+    frac_digits = 0
+    if len(dot_cols):
+        dot = dot_cols[0]
+        if dot >= mantissa_end or not np.all(field[dot] == ord('.')):
+            return None
+        frac_digits = mantissa_end - dot - 1
+        mantissa = _parse_int(np.delete(field[:mantissa_end], dot, axis=0), sign_width=dot)
+    else:
+        mantissa = _parse_int(field[:mantissa_end])
+    if mantissa is None:
+        return None
+
+    # value = mantissa * 10**(exponent - frac_digits), using one exact power of ten per row
+    power = np.broadcast_to(exponent - frac_digits, mantissa.shape)
+    inexact = (np.abs(power) >= len(_EXACT_POW10)) | (np.abs(mantissa) >= _MAX_EXACT_MANTISSA)
+    scale = _EXACT_POW10[np.where(inexact, 0, np.abs(power)).astype(np.intp)]
+    values = np.where(power >= 0, mantissa * scale, mantissa / scale)
+    # Rows that would need more than one rounding are rare, so leave them to float()
+    for row in np.flatnonzero(inexact):
+        try:
+            values[row] = float(field[:, row].tobytes())
+        except ValueError:
+            return None
+    return values
+
+
+def _parse_int(field: np.ndarray, sign_width: int | None = None) -> np.ndarray | None:
+    """
+    Decodes right-aligned integers, given as (width, n_rows) character columns, each row reading
+    [blanks][sign]digits. Blanks and the sign may only appear in the first sign_width columns
+    (default: all columns). Returns exact integer values as float64.
+    """
+    width = len(field)
+    if width == 0 or width > _MAX_DIGITS:
+        return None
+    if sign_width is None:
+        sign_width = width
+
+    digits = field - np.uint8(_DIGIT_0)
+    non_digit = digits > 9
+    # Non-digits may only form a prefix of blanks, optionally ending in a sign right before the digits
+    if np.any(non_digit[sign_width:]) or np.any(non_digit[-1]) or np.any(non_digit[1:] > non_digit[:-1]):
+        return None
+    is_minus = field == ord('-')
+    is_sign = is_minus | (field == ord('+'))
+    if np.any(non_digit > (is_sign | (field <= _BLANK_MAX))) or np.any(is_sign[:-1] & non_digit[1:]):
+        return None
+
+    digits[non_digit] = 0
+    # Every partial sum is an integer below 2**53, so the float64 product is exact
+    values = _EXACT_POW10[width - 1::-1] @ digits.astype(np.float64)
+    return np.where(np.any(is_minus, axis=0), -values, values)
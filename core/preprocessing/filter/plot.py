@@ -1,20 +1,55 @@
+import os
 import pandas as pd
 import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
 from core.parser.datParser import DATParser
 
-def plot_max_disp(dat_dir: Path) -> None: # Possible limitation: only using dat
-    max_disp = []
-    dat_files = []
-    for dat_file in dat_dir.glob("*.dat"):
-        parser = DATParser(str(dat_file))
-        max_disp.append(parser.get_max_disp())
-        dat_files.append(dat_file.stem)
+def _max_disp_per_mode(dat_file: str, use_mmap: bool) -> pd.DataFrame:
+    parser = DATParser(dat_file, use_mmap=use_mmap)
+    try:
+        return parser.get_max_disp_per_mode()
+    finally:
+        parser.close()
 
-    plt.scatter(dat_files, max_disp)
+def max_disp_scan(dat_files: list[Path], workers: int | None = None, use_mmap: bool = True) -> pd.DataFrame:
+    """
+    Computes the maximum resultant displacement of every mode of every .dat file, one file per worker process.
+    Files are memory-mapped by default and parsed one mode at a time, so memory stays bounded per worker.
+    Files that cannot be parsed are skipped with a warning.
+
+    Returns:
+    pd.DataFrame: ['model', 'mode', 'max_disp'], model being the file stem, sorted by model and mode.
+    """
+    frames = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = {executor.submit(_max_disp_per_mode, str(dat_file), use_mmap): Path(dat_file) for dat_file in dat_files}
+        for future in as_completed(futures):
+            dat_file = futures[future]
+            try:
+                mode_max_disp = future.result()
+            except Exception as e:
+                print(f"Warning: skipping {dat_file}: {e}")
+                continue
+            frames.append(pd.DataFrame({
+                'model': dat_file.stem,
+                'mode': mode_max_disp['mode_no'],
+                'max_disp': mode_max_disp['max_disp'],
+            }))
+
+    if not frames:
+        return pd.DataFrame({'model': pd.Series(dtype=str), 'mode': pd.Series(dtype='int64'), 'max_disp': pd.Series(dtype='float64')})
+    return pd.concat(frames, ignore_index=True).sort_values(['model', 'mode'], ignore_index=True)
+
+def plot_max_disp(dat_dir: Path, workers: int | None = None) -> pd.DataFrame: # Possible limitation: only using dat
+    max_disp_df = max_disp_scan(sorted(Path(dat_dir).glob("*.dat")), workers=workers)
+    model_max_disp = max_disp_df.groupby('model')['max_disp'].max()
+
+    plt.scatter(model_max_disp.index, model_max_disp.values)
     plt.xlabel("Model Number")
     plt.ylabel("Max Displacement (m)")
     plt.title("Max Displacement vs Model Number")
     plt.legend()
-    plt.show()
\ No newline at end of file
+    plt.show()
+    return max_disp_df
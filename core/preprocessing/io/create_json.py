@@ -1,6 +1,8 @@
 import json
 import os
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
 
 from core.parser.inpParser import INPParser
 from core.parser.datParser import DATParser
@@ -22,39 +24,16 @@ def create_json_from_inp(inp_file, dest_file):
         }
     ]
 
-    json_output = json.dumps(data, indent=4)
-
-    # Create and write to file
-    os.makedirs(os.path.dirname(dest_file), exist_ok=True)
-    with open(dest_file, "w") as f:
-        f.write(json_output)
-
-    return json_output
+    return _write_json(data, dest_file)
 
 # For results
 def create_result_json_from_dat(dat_file, dest_file): #TODO: change (one for each mode)
     assert(dat_file.endswith(".dat"), "Source file must be a .dat file")
     assert(dest_file.endswith(".json"), "Destination file must be a .json file")
 
-    parser = DATParser(dat_file)
-    freq = []
-    for i in range(1, 51): # TODO: change range to max modes
-        freq.append(parser.get_freq(i))
-
-    data= [{
-        "label": "Modal frequencies",
-        "type": "vector",
-        "data": freq
-    }]
-
-    json_output = json.dumps(data, indent=4)
-
-    # Create and write to file
-    os.makedirs(os.path.dirname(dest_file), exist_ok=True)
-    with open(dest_file, "w") as f:
-        f.write(json_output)
-
-    return json_output
+    # Frequencies of every mode in the eigenvalue table, in mode order
+    mode_table_df = dat_mode_table(dat_file)
+    return _write_json(_result_data(mode_table_df['freq'].tolist()), dest_file)
 
 # For input
 def create_input_json_from_dat(dat_file, mode, dest_file):
@@ -62,18 +41,84 @@ def create_input_json_from_dat(dat_file, mode, dest_file):
     assert(dest_file.endswith(".json"), "Destination file must be a .json file")
 
     parser = DATParser(dat_file)
-    label = "Frequency"
-    data = [parser.get_freq(mode)]
-    input_data = [{
-        "label": label,
-        "data": data
+    return _write_json(_input_data(parser.get_freq(mode)), dest_file)
+
+# For a whole dataset
+def dat_mode_table(dat_file) -> pd.DataFrame:
+    """
+    Returns the eigenvalue table ['mode_no', 'freq'] of a .dat file in mode order, reading only the head of the file.
+    The modes exported by export_dat_jsons are the mode numbers of this table.
+    """
+    return DATParser(str(dat_file)).mode_table_df.sort_values('mode_no')
+
+def export_dat_jsons(dat_file, output_dir, input_jsons=True, result_json=True) -> list[str]:
+    """
+    Writes the JSON files of a .dat file from a single parse of its eigenvalue table: one <stem>_mode<n>_inp.json
+    per mode, as create_input_json_from_dat, and <stem>.json with the frequencies of all modes, as create_result_json_from_dat.
+    Every mode of the file is exported.
+
+    Returns:
+    list[str]: Paths of the files written.
+    """
+    if not str(dat_file).endswith(".dat"):
+        raise ValueError(f"Source file must be a .dat file. Provided: {dat_file}")
+    stem = Path(dat_file).stem
+    mode_table_df = dat_mode_table(dat_file)
+    freqs = mode_table_df['freq'].tolist()
+
+    written = []
+    if input_jsons:
+        for mode, freq in zip(mode_table_df['mode_no'].tolist(), freqs):
+            dest_file = os.path.join(output_dir, f"{stem}_mode{mode}_inp.json")
+            _write_json(_input_data(freq), dest_file)
+            written.append(dest_file)
+    if result_json:
+        dest_file = os.path.join(output_dir, f"{stem}.json")
+        _write_json(_result_data(freqs), dest_file)
+        written.append(dest_file)
+    return written
+
+def batch_export_dat_jsons(dat_files, output_dir, workers=None, input_jsons=True, result_json=True) -> dict[str, list[str]]:
+    """
+    Runs export_dat_jsons on every .dat file, one file per worker process.
+    Files that cannot be parsed are skipped with a warning.
+
+    Returns:
+    dict: {dat_file: paths written} of the files exported.
+    """
+    written = {}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = {
+            executor.submit(export_dat_jsons, str(dat_file), str(output_dir), input_jsons, result_json): str(dat_file)
+            for dat_file in dat_files
+        }
+        for future in as_completed(futures):
+            dat_file = futures[future]
+            try:
+                written[dat_file] = future.result()
+            except Exception as e:
+                print(f"Warning: skipping {dat_file}: {e}")
+    return written
+
+def _result_data(freq):
+    return [{
+        "label": "Modal frequencies",
+        "type": "vector",
+        "data": freq
     }]
 
-    json_output = json.dumps(input_data, indent=4)
+def _input_data(freq):
+    return [{
+        "label": "Frequency",
+        "data": [freq]
+    }]
+
+def _write_json(data, dest_file):
+    json_output = json.dumps(data, indent=4)
 
     # Create and write to file
-    os.makedirs(os.path.dirname(dest_file), exist_ok=True)
+    os.makedirs(os.path.dirname(os.path.abspath(dest_file)), exist_ok=True)
     with open(dest_file, "w") as f:
         f.write(json_output)
 
-    return json_output
\ No newline at end of file
+    return json_output
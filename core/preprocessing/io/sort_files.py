@@ -28,3 +28,19 @@ def sort_files(folder: str, inp_dir: str, dat_dir: str, odb_dir: str):
 
                 shutil.move(src_path, dest_path)
                 print(f"Moved {src_path} to {dest_path}")
+
+
+def find_model_pairs(dat_dir: str, inp_dir: str) -> list[tuple[str, str, str]]:
+    """
+    Returns (name, dat_file, inp_file) of every .dat file in dat_dir with a .inp file of the same name
+    in inp_dir, as written by sort_files (e.g. dat/01_001.dat and inp/01_001.inp), sorted by name.
+    """
+    dat_files = {os.path.splitext(f)[0]: os.path.join(dat_dir, f) for f in os.listdir(dat_dir) if f.lower().endswith('.dat')}
+    inp_files = {os.path.splitext(f)[0]: os.path.join(inp_dir, f) for f in os.listdir(inp_dir) if f.lower().endswith('.inp')}
+
+    for name in sorted(dat_files.keys() - inp_files.keys()):
+        print(f"Warning: {dat_files[name]} has no matching .inp file and will be skipped.")
+    for name in sorted(inp_files.keys() - dat_files.keys()):
+        print(f"Warning: {inp_files[name]} has no matching .dat file and will be skipped.")
+
+    return [(name, dat_files[name], inp_files[name]) for name in sorted(dat_files.keys() & inp_files.keys())]
@@ -0,0 +1,141 @@
+import contextvars
+import functools
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError: # not available on Windows
+    resource = None
+
+# Profiler collecting the stages of the current run, None when profiling is off
+_active = contextvars.ContextVar("profiler", default=None)
+
+
+class Profiler:
+    """
+    Profiler records the wall time, call count and peak memory of the instrumented stages of a run
+    (file reads, keyword searches, table parsing, metrics, classification...). Profiling is opt-in: stages
+    are only recorded while a Profiler is active, and cost a single context lookup otherwise.
+    Memory is traced with tracemalloc, which slows allocations down, so it can be turned off with trace_memory=False.
+    Usage:
+        with Profiler() as profiler:
+            model = ModalParser(dat_file, inp_file)
+            ModalAnalyser(model).get_results()
+        print(profiler.to_json())
+    Attributes:
+        trace_memory (bool): If True, the peak memory allocated during every stage is recorded.
+        stages (dict): {name: {'calls', 'total_s', 'max_s', 'peak_mb'}} of every stage, in the order first entered.
+        total_s (float): Wall time of the whole run, once the profiler is exited.
+    Methods:
+        stage(name): Context manager recording one call of a stage.
+        report(): Returns the stages and totals as a JSON-serialisable dict.
+        to_json(path): Returns the report as JSON, and writes it to path if given.
+    """
+    def __init__(self, trace_memory: bool = True):
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.total_s = None
+        self._start = None
+        self._token = None
+        self._started_tracing = False
+        self._peaks = [] # peak traced memory seen so far by every open stage, innermost last
+
+    def __enter__(self) -> "Profiler":
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._token = _active.set(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.total_s = time.perf_counter() - self._start
+        _active.reset(self._token)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextmanager
+    def stage(self, name: str):
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            # The peak is reset for this stage, so keep what the enclosing stage has seen so far
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            tracemalloc.reset_peak()
+            self._peaks.append(current)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stats = self.stages.setdefault(name, {"calls": 0, "total_s": 0.0, "max_s": 0.0, "peak_mb": None})
+            stats["calls"] += 1
+            stats["total_s"] += elapsed
+            stats["max_s"] = max(stats["max_s"], elapsed)
+            if tracing:
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+                # Peak of all traced memory while the stage ran, including what was allocated before it
+                stats["peak_mb"] = max(stats["peak_mb"] or 0.0, peak / (1024 * 1024))
+
+    def report(self) -> dict:
+        max_rss_mb = None
+        if resource is not None:
+            # ru_maxrss is in kilobytes on Linux and bytes on macOS
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            max_rss_mb = max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+        return {
+            "total_s": self.total_s,
+            "max_rss_mb": max_rss_mb,
+            "stages": {
+                name: {**stats, "mean_s": stats["total_s"] / stats["calls"]}
+                for name, stats in self.stages.items()
+            },
+        }
+
+    def to_json(self, path: str | None = None) -> str:
+        report = json.dumps(self.report(), indent=2)
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(report)
+        return report
+
+
+def active_profiler() -> Profiler | None:
+    return _active.get()
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Records a stage in the active profiler, if any.
+    """
+    profiler = _active.get()
+    if profiler is None:
+        yield
+        return
+    with profiler.stage(name):
+        yield
+
+
+def profiled(name: str):
+    """
+    Decorator recording every call of a function as a stage of the active profiler, if any.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            profiler = _active.get()
+            if profiler is None:
+                return fn(*args, **kwargs)
+            with profiler.stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -3,6 +3,21 @@ import { useNavigate } from "react-router-dom";
 import axios from "axios";
 import "./FileUpload.css";
 
+const POLL_INTERVAL_MS = 1000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Polls an analysis job until it is done or failed
+async function pollJob(jobId) {
+  while (true) {
+    const response = await axios.get(`/jobs/${jobId}`);
+    if (response.data.status === "done" || response.data.status === "failed") {
+      return response.data;
+    }
+    await sleep(POLL_INTERVAL_MS);
+  }
+}
+
 function FileUpload() {
   const [datFile, setDatFile] = useState(null);
   const [inpFile, setInpFile] = useState(null);
@@ -69,11 +84,23 @@ function FileUpload() {
         },
       });
 
-      // Navigate to results page with the response data
-      navigate("/results", { state: { results: response.data } });
+      // The analysis runs as a background job, poll it until it finishes
+      const job = await pollJob(response.data.job_id);
+      if (job.status === "failed") {
+        console.error("Error processing files:", job.error);
+        alert(`Error processing files: ${job.error}`);
+        return;
+      }
+
+      // Navigate to results page with the job result
+      navigate("/results", { state: { results: job.result } });
     } catch (error) {
       console.error("Error uploading files:", error);
-      alert("Error processing files. Please try again.");
+      if (error.response?.status === 429) {
+        alert("The server is busy with other analyses. Please try again in a moment.");
+      } else {
+        alert("Error processing files. Please try again.");
+      }
     } finally {
       setIsProcessing(false);
     }
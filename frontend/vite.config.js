@@ -10,6 +10,10 @@ export default defineConfig({
         target: "http://localhost:5000",
         changeOrigin: true,
       },
+      "/jobs": {
+        target: "http://localhost:5000",
+        changeOrigin: true,
+      },
     },
   },
 });
@@ -0,0 +1,133 @@
+import argparse
+import contextlib
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from core.parser.modalParser import ModalParser
+from core.analyser.modalAnalyser import ModalAnalyser
+from core.preprocessing.io.sort_files import find_model_pairs
+
+
+def analyse_model(name, dat_path, inp_path, cache_dir=None, use_mmap=False, verbose=False):
+    """
+    Runs ModalParser + ModalAnalyser on one dat/inp pair and returns one row of the batch results table,
+    with the per-mode metrics of the model (ModalAnalyser.get_mode_metrics, None if it could not be analysed).
+    Errors are recorded in the row instead of raised, so one bad model does not stop the batch.
+    """
+    row = {"model": name, "dat_file": dat_path, "inp_file": inp_path}
+    metrics = None
+    start = time.perf_counter()
+    try:
+        # Workers share the terminal, so analysis output is only shown when asked for
+        with contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO()):
+            model = ModalParser(dat_path, inp_path, use_mmap=use_mmap, cache_dir=cache_dir)
+            # Construction only reads the eigenvalue table, so load the nodes and displacements here for parse_s
+            model.geometry
+            model.get_displacements()
+            parsed = time.perf_counter()
+            analyser = ModalAnalyser(model)
+            passed = analyser.get_results()
+        analysed = time.perf_counter()
+        metrics = analyser.get_mode_metrics().reset_index()
+        metrics.insert(0, "model", name)
+
+        row.update({
+            "n_modes": model.max_modes,
+            "n_nodes": len(model.geometry),
+            "inplane_modes": " ".join(map(str, analyser.inplane_modes)),
+            "outplane_modes": " ".join(map(str, analyser.outplane_modes)),
+            "min_lower_diff_hz": analyser.results["Lower Frequency Diff (Hz)"].min(),
+            "min_upper_diff_hz": analyser.results["Upper Frequency Diff (Hz)"].min(),
+            "min_separation_hz": analyser.min_separation,
+            "passed": passed,
+            "parse_s": parsed - start,
+            "analyse_s": analysed - parsed,
+            "error": None,
+        })
+    except Exception as e:
+        row.update({"passed": None, "error": f"{type(e).__name__}: {e}"})
+    row["total_s"] = time.perf_counter() - start
+    return row, metrics
+
+
+def write_results(results, output_path):
+    """
+    Writes the results table as .parquet (requires pyarrow) or, for any other extension, .csv.
+    Returns the path written to.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    if str(output_path).endswith(".parquet"):
+        try:
+            results.to_parquet(output_path, index=False)
+            return output_path
+        except ImportError as e:
+            output_path = os.path.splitext(output_path)[0] + ".csv"
+            print(f"Warning: cannot write parquet ({e.__class__.__name__}), writing {output_path} instead.")
+    results.to_csv(output_path, index=False)
+    return output_path
+
+
+def main(dat_dir, inp_dir, output_path, workers=None, cache_dir=None, use_mmap=False, verbose=False, metrics_output=None):
+    pairs = find_model_pairs(dat_dir, inp_dir)
+    if not pairs:
+        raise ValueError(f"No matching .dat/.inp pairs found in {dat_dir} and {inp_dir}")
+    workers = workers or os.cpu_count()
+    print(f"Analysing {len(pairs)} models with {workers} workers...")
+
+    start = time.perf_counter()
+    rows = []
+    metrics = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(analyse_model, name, dat_path, inp_path, cache_dir, use_mmap, verbose)
+            for name, dat_path, inp_path in pairs
+        ]
+        for i, future in enumerate(as_completed(futures), start=1):
+            row, model_metrics = future.result()
+            rows.append(row)
+            if model_metrics is not None:
+                metrics.append(model_metrics)
+            status = row["error"] if row["error"] else ("passed" if row["passed"] else "did not pass")
+            print(f"[{i}/{len(pairs)}] {row['model']}: {status} ({row['total_s']:.2f} s)")
+
+    results = pd.DataFrame(rows).sort_values("model", ignore_index=True)
+    for column in ("n_modes", "n_nodes"):
+        if column in results:
+            results[column] = results[column].astype("Int64")
+    output_path = write_results(results, output_path)
+    if metrics_output is not None and metrics:
+        # One row per (model, mode), for comparing the metrics the classification was made from across models
+        mode_metrics = pd.concat(metrics, ignore_index=True).sort_values(["model", "mode_no"], ignore_index=True)
+        metrics_output = write_results(mode_metrics, metrics_output)
+        print(f"Mode metrics written to {metrics_output}")
+
+    n_failed = results["error"].notna().sum()
+    print(f"Analysed {len(results) - n_failed}/{len(results)} models in {time.perf_counter() - start:.2f} s. Results written to {output_path}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run modal analysis on every dat/inp pair of a dataset in parallel.")
+    parser.add_argument("-d", "--data_dir", help="Folder holding the dat/ and inp/ folders written by scripts.sort (default: config.DATADIR)")
+    parser.add_argument("--dat_dir", help="Folder of .dat files (default: <data_dir>/dat)")
+    parser.add_argument("--inp_dir", help="Folder of .inp files (default: <data_dir>/inp)")
+    parser.add_argument("-o", "--output", default="batch_results.csv", help="Results table, .csv or .parquet")
+    parser.add_argument("--metrics_output", help="Also write the per-mode metrics of every model to this table, .csv or .parquet")
+    parser.add_argument("-w", "--workers", type=int, help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument("--cache_dir", help="Directory to cache parsed models in, so re-analysing the same files skips parsing")
+    parser.add_argument("--mmap", action="store_true", help="Memory-map the .dat and .inp files instead of reading them into memory")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show the analysis output of every model")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir
+    if data_dir is None and (args.dat_dir is None or args.inp_dir is None):
+        from config import DATADIR
+        data_dir = DATADIR
+    dat_dir = args.dat_dir or Path(data_dir) / "dat"
+    inp_dir = args.inp_dir or Path(data_dir) / "inp"
+
+    main(dat_dir, inp_dir, args.output, workers=args.workers, cache_dir=args.cache_dir, use_mmap=args.mmap, verbose=args.verbose, metrics_output=args.metrics_output)
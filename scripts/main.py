@@ -1,12 +1,51 @@
 import argparse
+import contextlib
+import json
 
 from core.parser.modalParser import ModalParser
-from core.analyser.modalAnalyser import ModalAnalyser
+from core.parser.datParser import DTYPES
+from core.analyser.modalAnalyser import ENGINES, ModalAnalyser, RIGID_RATIO_THRES, TANG_RATIO_THRES
+from core.profiling import Profiler
 
-def main(dat_path, inp_path):
-    model=ModalParser(dat_path, inp_path)
-    analyser = ModalAnalyser(model)
-    passed = analyser.get_results()
+def main(
+    dat_path,
+    inp_path,
+    cache_dir=None,
+    mode_index=None,
+    cache_key=None,
+    oop_thres=90,
+    near_inplane_thres=300,
+    tang_ratio_thres=TANG_RATIO_THRES,
+    rigid_ratio_thres=RIGID_RATIO_THRES,
+    profile=False,
+    engine="batched",
+    chunk_size=100000,
+    use_mmap=False,
+    dtype="float64",
+):
+    # Stage timings are only recorded when asked for
+    profiler = Profiler() if profile else None
+    with profiler or contextlib.nullcontext():
+        # A .dat index built while the file was uploaded gives byte offsets, which are read through mmap
+        model=ModalParser(
+            dat_path,
+            inp_path,
+            cache_dir=cache_dir,
+            use_mmap=use_mmap or mode_index is not None,
+            mode_index=mode_index,
+            cache_key=cache_key,
+            dtype=dtype,
+        )
+        analyser = ModalAnalyser(
+            model,
+            oop_thres=oop_thres,
+            near_inplane_thres=near_inplane_thres,
+            tang_ratio_thres=tang_ratio_thres,
+            rigid_ratio_thres=rigid_ratio_thres,
+            engine=engine,
+            chunk_size=chunk_size,
+        )
+        passed = analyser.get_results()
 
     if passed:
         print("passed") 
@@ -18,7 +57,13 @@ def main(dat_path, inp_path):
         "Inplane modes": analyser.inplane_modes,
         "Out-of-plane modes": analyser.outplane_modes,
         "Modal Separation Target": "Met" if passed else "Not met",
+        "Minimum separation (Hz)": analyser.min_separation,
+        "Mode metrics": analyser.get_mode_metrics(),
+        "Mode table": model.mode_table_df,
+        "Model cached": model.cache_hit,
     }
+    if profiler is not None:
+        output["Profile"] = profiler.report()
 
     return output
 
@@ -26,10 +71,39 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run modal analysis.")
     parser.add_argument("-dat", "--dat_path", required=True, help="Path to the .dat file")
     parser.add_argument("-inp", "--inp_path", required=True, help="Path to the .inp file (optional)")
+    parser.add_argument("--cache_dir", help="Directory to cache parsed models in, so re-analysing the same files skips parsing")
+    parser.add_argument("--oop_thres", type=float, default=90, help="Out-of-plane proportion (%%) above which a mode is out-of-plane")
+    parser.add_argument("--near_inplane_thres", type=float, default=300, help="Minimum separation (Hz) between in-plane and out-of-plane modes")
+    parser.add_argument("--tang_ratio_thres", type=float, default=TANG_RATIO_THRES, help="Tangential-to-radial energy ratio above which a mode is tangential")
+    parser.add_argument("--rigid_ratio_thres", type=float, default=RIGID_RATIO_THRES, help="Rigid rotation ratio above which a mode is a rigid rotation")
+    parser.add_argument("--engine", choices=ENGINES, default="batched", help="How per-mode metrics are computed (streaming bounds memory by --chunk_size)")
+    parser.add_argument("--chunk_size", type=int, default=100000, help="Nodes read at a time by the streaming engine")
+    parser.add_argument("--mmap", action="store_true", help="Memory-map the .dat and .inp files instead of reading them into memory")
+    parser.add_argument("--dtype", choices=DTYPES, default="float64", help="Storage type of coordinates and displacements (float32 halves memory)")
+    parser.add_argument("--profile", nargs="?", const="-", help="Write per-stage timings and peak memory as JSON to this file (default: print them)")
     args = parser.parse_args()
 
     dat_path = args.dat_path
     inp_path = args.inp_path
 
-    main(dat_path, inp_path)
+    output = main(
+        dat_path,
+        inp_path,
+        cache_dir=args.cache_dir,
+        oop_thres=args.oop_thres,
+        near_inplane_thres=args.near_inplane_thres,
+        tang_ratio_thres=args.tang_ratio_thres,
+        rigid_ratio_thres=args.rigid_ratio_thres,
+        profile=args.profile is not None,
+        engine=args.engine,
+        chunk_size=args.chunk_size,
+        use_mmap=args.mmap,
+        dtype=args.dtype,
+    )
+    if args.profile == "-":
+        print(json.dumps(output["Profile"], indent=2))
+    elif args.profile is not None:
+        with open(args.profile, "w") as f:
+            json.dump(output["Profile"], f, indent=2)
+        print(f"Profile written to {args.profile}")
 
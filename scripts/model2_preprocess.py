@@ -4,7 +4,7 @@ import argparse
 from pathlib import Path
 
 from config import DATADIR
-from core.preprocessing.io.create_json import create_input_json_from_dat
+from core.preprocessing.io.create_json import batch_export_dat_jsons, dat_mode_table
 from core.preprocessing.io.create_h3d import create_h3d_from_odb
 
 def update_simulation_number(config_path, new_number):
@@ -19,26 +19,31 @@ def update_simulation_number(config_path, new_number):
         f.writelines(lines)
 
 
-def main(inp_dir, odb_dir, dat_dir, output_dir, config_file, file_range=None):
+def main(inp_dir, odb_dir, dat_dir, output_dir, config_file, file_range=None, workers=None):
     # Create global hooks
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    # Convert odb to h3d 
+    # Convert odb to h3d, one file per mode of the eigenvalue table, as for the input json below
     for odb_file in odb_dir.glob("*.odb"):
         if file_range and (int(odb_file.stem) < file_range[0] or int(odb_file.stem) > file_range[1]):
             continue
-        for i in range(1, 51):
+        dat_file = dat_dir / f"{odb_file.stem}.dat"
+        try:
+            mode_numbers = dat_mode_table(dat_file)['mode_no'].tolist()
+        except Exception as e:
+            print(f"Warning: skipping {odb_file}, cannot read the modes of {dat_file}: {e}")
+            continue
+        for i in mode_numbers:
             output_path = str(output_dir / f"{odb_file.stem}_mode{i}.h3d")
             update_simulation_number(config_file, i)
             create_h3d_from_odb(str(odb_file), output_path, config_file)
 
-    # Create input json
-    for dat_file in dat_dir.glob("*.dat"):
-        if file_range and (int(dat_file.stem) < file_range[0] or int(dat_file.stem) > file_range[1]):
-            continue
-        for i in range(1, 51):
-            output_path = str(output_dir / f"{dat_file.stem}_mode{i}_inp.json") 
-            create_input_json_from_dat(str(dat_file), i, output_path)
+    # Create input json: every mode of every file, each file parsed once, files in parallel
+    dat_files = [
+        dat_file for dat_file in dat_dir.glob("*.dat")
+        if not file_range or file_range[0] <= int(dat_file.stem) <= file_range[1]
+    ]
+    batch_export_dat_jsons(dat_files, output_dir, workers=workers, result_json=False)
 
 if __name__ == "__main__":
     data_dir = Path(DATADIR)
@@ -50,8 +55,9 @@ if __name__ == "__main__":
     config_file = str(model2_dataset_dir / "config.cfg")
     parser = argparse.ArgumentParser(description="Preprocess modal analysis data.")
     parser.add_argument('--range', type=int, nargs=2, metavar=('START', 'END'), help='range of files to process (start end)', required=False)
+    parser.add_argument('-w', '--workers', type=int, help='number of worker processes for the json export (default: number of CPUs)', required=False)
     args = parser.parse_args()
 
     # If user wants to process just one file, pass the same value for start and end in --range
     # Example: --range 1 1 will process only file 1
-    main(inp_dir, odb_dir, dat_dir, model2_dataset_dir, config_file, file_range=args.range if args.range else None)
\ No newline at end of file
+    main(inp_dir, odb_dir, dat_dir, model2_dataset_dir, config_file, file_range=args.range if args.range else None, workers=args.workers)
\ No newline at end of file
@@ -1,3 +1,4 @@
+import argparse
 from pathlib import Path
 
 from core.preprocessing.filter.plot import plot_max_disp
@@ -5,5 +6,12 @@ from core.preprocessing.filter.plot import plot_max_disp
 from config import DATADIR
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plot the maximum displacement of every .dat file of the dataset.")
+    parser.add_argument('-w', '--workers', type=int, help='Number of worker processes (default: number of CPUs)')
+    parser.add_argument('-o', '--output', help='Save the (model, mode, max_disp) table to this .csv file')
+    args = parser.parse_args()
+
     dat_path = Path(DATADIR) / "dat"
-    plot_max_disp(dat_path)
\ No newline at end of file
+    max_disp_df = plot_max_disp(dat_path, workers=args.workers)
+    if args.output:
+        max_disp_df.to_csv(args.output, index=False)
@@ -0,0 +1,36 @@
+import tempfile
+import unittest
+
+from benchmarks.check_precision import analyse
+from benchmarks.synthetic import write_model
+from core.analyser.modalAnalyser import ENGINES
+
+
+class TestFloat32Precision(unittest.TestCase):
+    """
+    float32 models (ModalParser(dtype="float32")) must classify modes as float64 ones do,
+    as benchmarks.check_precision checks on larger models.
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.dat_file, cls.inp_file = write_model(cls.tmp_dir.name, "model", n_nodes=20000, n_modes=10)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_classification_matches_float64(self):
+        for engine in ENGINES:
+            for use_mmap in (False, True):
+                with self.subTest(engine=engine, use_mmap=use_mmap):
+                    reference, ref_passed, _, _ = analyse(self.dat_file, self.inp_file, "float64", engine, use_mmap)
+                    compact, passed, _, _ = analyse(self.dat_file, self.inp_file, "float32", engine, use_mmap)
+                    self.assertEqual(compact.inplane_modes, reference.inplane_modes)
+                    self.assertEqual(compact.outplane_modes, reference.outplane_modes)
+                    self.assertEqual(passed, ref_passed)
+                    self.assertAlmostEqual(compact.min_separation, reference.min_separation, places=3)
+
+
+if __name__ == "__main__":
+    unittest.main()